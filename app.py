@@ -1,14 +1,42 @@
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for, flash
-import pandas as pd
-import sqlite3
+from flask import Flask, Response, render_template, request, jsonify, session, redirect, url_for, flash
+import atexit
 import json
+import logging
 import os
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 import secrets
 from werkzeug.security import generate_password_hash, check_password_hash
+from csv_loader import read_csv
+from data_registry import DataRegistry
+from data_watcher import DataWatcher
+from exercise_sync import SOURCE_CUSTOM, bump_catalog_version, catalog_version, sync_exercises
+from exercise_listing import build_listing, listing_etag, parse_listing_args
+from exercise_search import prerank, rank_ids, search_exercises
+from catalog import ExerciseCatalog, lookup_exercises
+from db import ConnectionManager
+from migrations import check_query_plans, run_migrations
+from workout_selector import select_exercises
+from llm_cache import ResponseCache, make_cache_key
+from llm_client import LLMClient
+from llm_jobs import GenerationJobs
+from llm_stream import IncrementalExerciseParser, format_sse, iter_completion_deltas
+from prompt_compaction import PromptStats, compact_candidates, expand_exercise
+from progress_rollup import DOMAIN_KEYS, rebuild_rollups, record_session
+from saved_workouts import list_workouts, load_workout, save_workout
+from write_queue import WriteBehindQueue
+from streaks import local_day, next_streak, rebuild_streaks, record_activity, resolve_timezone
+from program_index import build_program_index, find_session, program_ids
+from dashboard import DashboardCache, bump_user_version, guest_dashboard, load_dashboard, user_version
+from serialization import FastJSONProvider, PayloadCache
+from session_plan import SessionPlanCache
 
 app = Flask(__name__)
 app.secret_key = secrets.token_hex(16)
+# jsonify encodes with orjson when it is installed
+app.json = FastJSONProvider(app)
+
+# Encoded bodies of the catalog listings and rest times, keyed by data version
+response_payloads = PayloadCache(max_size=int(os.environ.get('RESPONSE_CACHE_SIZE', 128)))
 
 # Configuration
 DATABASE = 'training_app.db'
@@ -18,11 +46,20 @@ UPLOAD_FOLDER = 'data'
 if not os.path.exists('data'):
     os.makedirs('data')
 
+# Per-thread SQLite connections in WAL mode, reused across requests
+db_connections = ConnectionManager()
+
 def get_db_connection():
-    """Create database connection with row factory for easy access."""
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row
-    return conn
+    """Get this thread's database connection with row factory for easy access.
+
+    Calling close() on it returns it for reuse rather than closing it.
+    """
+    return db_connections.get(DATABASE)
+
+@app.teardown_appcontext
+def release_db_connection(exception=None):
+    """Roll back anything a request left uncommitted on its connection."""
+    db_connections.release_thread()
 
 def init_db():
     """Initialize the database with required tables."""
@@ -96,166 +133,145 @@ def init_db():
     ''')
 
     conn.commit()
+
+    # Apply schema changes made since the tables above were first created
+    run_migrations(conn)
     conn.close()
 
+# Dataset name -> CSV file; each one is parsed (and hot-reloaded) on its own
+DATA_FILES = {
+    'exercise_rows': 'data/comprehensive_training_matrix.csv',
+    'program_rows': 'data/complete_4week_program.csv',
+    'student_program_rows': 'data/student_training_program.csv',
+    'rest_times': 'data/Category-Beginner-Intermediate-Advanced.csv'
+}
+
+def load_csv_dataset(name):
+    """Parse one data file, recording its state for the reload watcher."""
+    data_watcher.record(name)
+    return read_csv(DATA_FILES[name])
+
 def load_exercise_data():
     """Load exercise data from CSV files."""
-    try:
-        # Load comprehensive training matrix
-        print("Loading comprehensive_training_matrix.csv...")
-        exercises_df = pd.read_csv('data/comprehensive_training_matrix.csv')
-        print(f"Loaded {len(exercises_df)} exercises")
-
-        # Load 4-week program
-        print("Loading complete_4week_program.csv...")
-        program_df = pd.read_csv('data/complete_4week_program.csv')
-        print(f"Loaded {len(program_df)} program entries")
-
-        # Load student training program
-        print("Loading student_training_program.csv...")
-        student_program_df = pd.read_csv('data/student_training_program.csv')
-        print(f"Loaded {len(student_program_df)} student program entries")
-
-        return {
-            'exercises': exercises_df.to_dict('records'),
-            'program': program_df.to_dict('records'),
-            'student_program': student_program_df.to_dict('records')
-        }
-    except FileNotFoundError as e:
-        print(f"CSV file not found: {e}")
-        return {
-            'exercises': [],
-            'program': [],
-            'student_program': []
-        }
-    except Exception as e:
-        print(f"Error loading CSV files: {e}")
-        return {
-            'exercises': [],
-            'program': [],
-            'student_program': []
-        }
+    return {
+        'exercises': data_registry.get('exercise_rows'),
+        'program': data_registry.get('program_rows'),
+        'student_program': data_registry.get('student_program_rows')
+    }
 
 def populate_exercises_db():
-    """Populate exercises table from CSV data if empty."""
+    """Sync the exercises table with the exercise CSV, keeping custom exercises."""
+    rows = data_registry.get('exercise_rows')
     conn = get_db_connection()
-
-    # Check if table already has rows
     try:
-        count = conn.execute('SELECT COUNT(*) FROM exercises').fetchone()[0]
-        if count > 0:
-            conn.close()
-            return
-    except Exception:
-        pass
-
-    # Clear existing exercises
-    conn.execute('DELETE FROM exercises')
-
-    # Load exercise data
-    data = load_exercise_data()
+        counts = sync_exercises(conn, rows)
+    finally:
+        conn.close()
 
-    for exercise in data['exercises']:
-        conn.execute('''
-            INSERT INTO exercises (category, exercise_name, duration_minutes, 
-                                 primary_benefit, secondary_benefit, difficulty_level)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (
-            exercise['category'],
-            exercise['name'],
-            exercise['duration'],
-            exercise['description'],
-            exercise['target_muscles'],
-            exercise['difficulty']
-        ))
+    if counts['inserted'] or counts['updated'] or counts['deleted']:
+        print(f"Synced exercises table: {counts}")
+        exercise_catalog.invalidate()
 
-    conn.commit()
-    conn.close()
+def row_to_exercise(r):
+    """Convert an exercises table row into the API exercise dict."""
+    return {
+        'id': r['id'],
+        'category': r['category'],
+        'name': r['exercise_name'],
+        'duration': float(r['duration_minutes'] or 0.5),
+        'description': r['primary_benefit'] or '',
+        'target_muscles': r['secondary_benefit'] or '',
+        'difficulty': r['difficulty_level'] or 'beginner',
+        'instructions': r['instructions'] or ''
+    }
 
-def get_all_exercises_from_db():
-    """Retrieve exercises from the SQLite database."""
+def load_exercises_from_db():
+    """Read every exercise row from the SQLite database."""
     conn = get_db_connection()
     try:
         rows = conn.execute('''
-            SELECT category, exercise_name, duration_minutes, primary_benefit, secondary_benefit, difficulty_level, instructions
+            SELECT id, category, exercise_name, duration_minutes, primary_benefit, secondary_benefit, difficulty_level, instructions
             FROM exercises
         ''').fetchall()
-        exercises = []
-        for r in rows:
-            exercises.append({
-                'category': r['category'],
-                'name': r['exercise_name'],
-                'duration': float(r['duration_minutes'] or 0.5),
-                'description': r['primary_benefit'] or '',
-                'target_muscles': r['secondary_benefit'] or '',
-                'difficulty': r['difficulty_level'] or 'beginner',
-                'instructions': r['instructions'] or ''
-            })
-        return exercises
+        return [row_to_exercise(r) for r in rows]
     finally:
         conn.close()
 
-# Load data at startup
-training_data = load_exercise_data()
-
-def load_rest_times():
-    """Load rest times from CSV file."""
+def load_catalog_version():
+    """Catalog version recorded in the database by whichever process last changed it."""
+    conn = get_db_connection()
     try:
-        print("Loading Category-Beginner-Intermediate-Advanced.csv...")
-        rest_df = pd.read_csv('data/Category-Beginner-Intermediate-Advanced.csv')
-        print(f"Loaded {len(rest_df)} rest time categories")
-        
-        # Convert to dictionary for easy lookup
-        rest_times = {}
-        for _, row in rest_df.iterrows():
-            category = row['Category']
-            rest_times[category] = {
-                'beginner': int(row['Beginner']),
-                'intermediate': int(row['Intermediate']),
-                'advanced': int(row['Advanced'])
-            }
-        
-        return rest_times
-    except FileNotFoundError as e:
-        print(f"Rest times CSV file not found: {e}")
-        return {}
-    except Exception as e:
-        print(f"Error loading rest times CSV: {e}")
-        return {}
+        return catalog_version(conn)
+    finally:
+        conn.close()
 
-# Load rest times at startup
-rest_times = load_rest_times()
+# Process-wide exercise catalog cache, patched by api_add_exercise and
+# reloaded when another process changes the exercises table
+exercise_catalog = ExerciseCatalog(load_exercises_from_db, load_catalog_version)
 
-def get_today_session(user_id):
+def get_all_exercises_from_db():
+    """Retrieve exercises from the cached catalog snapshot."""
+    return list(exercise_catalog.snapshot().exercises)
+
+def load_rest_times():
+    """Load rest times from CSV file."""
+    rest_rows = load_csv_dataset('rest_times')
+    
+    # Convert to dictionary for easy lookup
+    rest_times = {}
+    for row in rest_rows:
+        category = row['Category']
+        rest_times[category] = {
+            'beginner': int(row['Beginner']),
+            'intermediate': int(row['Intermediate']),
+            'advanced': int(row['Advanced'])
+        }
+    
+    return rest_times
+
+# CSV-backed datasets, loaded on first use (or up front by gunicorn.conf.py)
+data_registry = DataRegistry()
+for name in ('exercise_rows', 'program_rows', 'student_program_rows'):
+    data_registry.register(name, lambda name=name: load_csv_dataset(name), default=list)
+data_registry.register('training_data', load_exercise_data,
+                       default=lambda: {'exercises': [], 'program': [], 'student_program': []},
+                       depends_on=['exercise_rows', 'program_rows', 'student_program_rows'])
+# (program_id, week, weekday) -> session, rebuilt whenever training_data is
+data_registry.register('program_index', lambda: build_program_index(data_registry.get('training_data')),
+                       default=dict, depends_on=['training_data'])
+data_registry.register('rest_times', load_rest_times, default=dict)
+
+def reload_dataset(name):
+    """Swap in a changed data file and bring the exercises table and catalog up to date."""
+    if not data_registry.refresh(name):
+        return
+    print(f"Reloaded {DATA_FILES[name]}")
+    if name == 'exercise_rows':
+        conn = get_db_connection()
+        try:
+            counts = sync_exercises(conn, data_registry.get('exercise_rows'))
+        finally:
+            conn.close()
+        print(f"Synced exercises table: {counts}")
+        # Refresh even when this sync changed nothing: another worker's watcher
+        # may have written the same change first. Caches keyed on the catalog
+        # version (or its fingerprint) move on.
+        exercise_catalog.refresh()
+
+# Polls the data files and reloads the ones whose contents changed
+data_watcher = DataWatcher(DATA_FILES, reload_dataset,
+                           interval=float(os.environ.get('DATA_RELOAD_INTERVAL', 2)))
+
+@app.before_request
+def start_data_watcher():
+    """Start the reload watcher in each serving process (no-op once running)."""
+    data_watcher.start()
+
+def get_today_session(user_id, dashboard=None):
     """Get the recommended training program session for today."""
     try:
-        current_week = 1
-        if user_id != 'guest':
-            conn = get_db_connection()
-            progress = conn.execute('''
-                SELECT current_week 
-                FROM user_progress 
-                WHERE user_id = ? 
-                LIMIT 1
-            ''', (user_id,)).fetchone()
-            if progress:
-                current_week = progress['current_week']
-            conn.close()
-        else:
-            current_week = session.get('current_week', 1)
-            
-        current_day = datetime.now().strftime('%A')
-        
-        if training_data and 'program' in training_data:
-            for entry in training_data['program']:
-                if int(entry.get('Week', 1)) == int(current_week) and str(entry.get('Day', '')).strip().lower() == current_day.lower():
-                    return {
-                        'name': entry.get('Type'),
-                        'description': entry.get('Description') or f"Focus: {entry.get('Focus')}",
-                        'duration': entry.get('Duration'),
-                        'difficulty': entry.get('Intensity'),
-                        'focus': entry.get('Focus') or ''
-                    }
+        dashboard = dashboard or get_dashboard(user_id)
+        return find_session(data_registry.get('program_index'), dashboard.program_ids, dashboard.current_week, dashboard.today)
     except Exception as e:
         print(f"Error getting today's session: {e}")
     return None
@@ -287,9 +303,10 @@ def index():
         }
 
     user_id = session.get('user_id')
-    progress_data = get_user_progress_data(user_id)
+    dashboard = get_dashboard(user_id)
+    progress_data = dashboard.progress
     recent_sessions = progress_data.get('recent_sessions', [])
-    today_session = get_today_session(user_id)
+    today_session = get_today_session(user_id, dashboard)
 
     return render_template('index.html',
                          progress_data=progress_data,
@@ -321,22 +338,87 @@ def training_session():
 # API Routes
 @app.route('/api/exercises')
 def api_exercises():
-    """Get all exercises from the SQLite database."""
+    """List exercises with optional filters, paging and field projection."""
+    try:
+        query = parse_listing_args(request.args)
+    except ValueError as e:
+        return jsonify({'exercises': [], 'error': str(e)}), 400
     try:
-        exercises = get_all_exercises_from_db()
-        return jsonify({'exercises': exercises})
+        snapshot = exercise_catalog.snapshot()
+        etag = listing_etag(exercise_catalog.fingerprint(snapshot), query)
+        # Each listing is encoded once per catalog version and query
+        return response_payloads.respond(request, ('exercises', etag),
+                                         lambda: build_listing(snapshot, query), etag)
     except Exception as e:
         return jsonify({'exercises': [], 'error': str(e)}), 500
 
-import urllib.request
-import urllib.error
+@app.route('/api/exercises/search')
+def api_search_exercises():
+    """Full-text search over exercise names, descriptions, muscles and instructions."""
+    q = request.args.get('q', '').strip()
+    if not q:
+        return jsonify({'exercises': [], 'error': 'q is required'}), 400
+    try:
+        query = parse_listing_args(request.args)
+    except ValueError as e:
+        return jsonify({'exercises': [], 'error': str(e)}), 400
+    page = query.page or 1
+    per_page = query.per_page or 20
+
+    conn = get_db_connection()
+    try:
+        # Fetch one extra row to tell whether another page exists
+        results = search_exercises(conn, q, per_page + 1, (page - 1) * per_page,
+                                   categories=query.categories, difficulty=query.difficulty,
+                                   min_duration=query.min_duration, max_duration=query.max_duration)
+    except Exception as e:
+        return jsonify({'exercises': [], 'error': str(e)}), 500
+    finally:
+        conn.close()
+
+    exercises = []
+    for row, score in results[:per_page]:
+        exercise = row_to_exercise(row)
+        if query.fields:
+            exercise = {f: exercise[f] for f in query.fields}
+        exercise['score'] = round(-score, 3)
+        exercises.append(exercise)
+    return jsonify({
+        'exercises': exercises,
+        'page': page,
+        'per_page': per_page,
+        'has_more': len(results) > per_page
+    })
+
 import re
 
 LM_STUDIO_API_URL = os.environ.get('LM_STUDIO_API_URL', 'http://localhost:1234/v1')
 
-def generate_workout_via_llm(domains, duration, difficulty, focus, candidates, goal=None):
-    url = f"{LM_STUDIO_API_URL}/chat/completions"
-    
+# Cache of successful LLM generations, keyed by normalized request parameters
+llm_response_cache = ResponseCache(
+    max_size=int(os.environ.get('LLM_CACHE_SIZE', 256)),
+    ttl=int(os.environ.get('LLM_CACHE_TTL', 3600)),
+    path=os.environ.get('LLM_CACHE_PATH') or None,
+    save_every=int(os.environ.get('LLM_CACHE_SAVE_EVERY', 20))
+)
+# Persist whatever the periodic saves have not written yet
+atexit.register(llm_response_cache.flush)
+
+# Shared LM Studio client with keep-alive connections, a cached model id and a circuit breaker
+llm_client = LLMClient(
+    LM_STUDIO_API_URL,
+    timeout=10,
+    model_ttl=int(os.environ.get('LLM_MODEL_TTL', 300)),
+    failure_threshold=int(os.environ.get('LLM_FAILURE_THRESHOLD', 3)),
+    reset_timeout=int(os.environ.get('LLM_CIRCUIT_RESET', 30))
+)
+
+def get_loaded_model():
+    """Return the id of the model currently loaded in LM Studio."""
+    return llm_client.loaded_model()
+
+def build_llm_messages(domains, duration, difficulty, focus, candidates, goal=None):
+    """Build the chat messages asking the LLM to design a workout."""
     system_content = "You are a professional fitness coach assistant. You must design a cohesive workout session using the provided candidate exercises. Respond ONLY with a raw JSON object containing the schema requested. No markdown format."
     
     user_content = f"""Design a workout session using the candidate exercises below.
@@ -346,84 +428,224 @@ Focus Area: {focus if focus else 'None'}
 Selected Domains: {', '.join(domains)}
 Custom Goal/Instructions: {goal if goal else 'None'}
 
-Candidate Exercises:
-{json.dumps(candidates, indent=2)}
+Candidate Exercises (grouped by category, one per line as id|name|minutes|difficulty|targets):
+{candidates.table}
 
 Rules:
-1. Select exercises from the Candidate Exercises that match the target domains.
+1. Select exercises from the Candidate Exercises that match the target domains and refer to each one by its id.
 2. The total sum of the selected exercise durations MUST be close to {duration} minutes.
 3. You can adjust the duration (in minutes) of selected exercises to fit the target duration.
-4. If there are not enough candidates, you may generate highly related new exercises that fit the target domains, using the same JSON format.
+4. If there are not enough candidates, you may generate highly related new exercises that fit the target domains. Give those a name, category, duration, difficulty, description and target_muscles instead of an id.
 5. Provide a short 2-3 sentence paragraph under the "explanation" key explaining why this workout is designed this way, what it targets, and how it helps the user achieve their specific Custom Goal or focus area.
 6. Respond strictly with JSON. Do not wrap in ```json or ``` blocks.
 
 Expected JSON output format:
 {{
   "exercises": [
-    {{
-      "name": "Exercise Name",
-      "category": "Category Name",
-      "duration": 1.0,
-      "difficulty": "beginner",
-      "description": "Short description of the exercise.",
-      "target_muscles": "Target muscles."
-    }}
+    {{"id": "e1", "duration": 1.0}}
   ],
   "total_duration": 15,
   "explanation": "This workout focuses on lower back stability and core strength..."
 }}"""
 
-    payload = {
+    return [
+        {"role": "system", "content": system_content},
+        {"role": "user", "content": user_content}
+    ]
+
+def parse_llm_workout(content, candidates):
+    """Parse the LLM's completion text into a workout, or None if unusable."""
+    content = content.strip()
+
+    # Clean up potential markdown blocks
+    if content.startswith("```"):
+        content = re.sub(r'^```(?:json)?\s*', '', content)
+        content = re.sub(r'\s*```$', '', content)
+        content = content.strip()
+        
+    workout_data = json.loads(content)
+    
+    if "exercises" in workout_data and isinstance(workout_data["exercises"], list):
+        # Map short candidate ids back to full exercise records
+        workout_data["exercises"] = [expand_exercise(ex, candidates.by_id) for ex in workout_data["exercises"]]
+        total_time = 0
+        for ex in workout_data["exercises"]:
+            ex["duration"] = float(ex.get("duration", 0.5))
+            total_time += ex["duration"]
+        
+        workout_data["total_duration"] = round(total_time, 1)
+        workout_data["explanation"] = workout_data.get("explanation", "Custom workout designed to fit your goals.")
+        workout_data["success"] = True
+        return workout_data
+    return None
+
+def build_llm_payload(messages):
+    """Build the chat completion request body for LM Studio."""
+    return {
         "model": get_loaded_model(),
-        "messages": [
-            {"role": "system", "content": system_content},
-            {"role": "user", "content": user_content}
-        ],
+        "messages": messages,
         "temperature": 0.3,
         "enable_thinking": False
     }
+
+def generate_workout_via_llm(domains, duration, difficulty, focus, candidates, goal=None):
+    messages = build_llm_messages(domains, duration, difficulty, focus, candidates, goal)
     
     try:
-        req = urllib.request.Request(url, method="POST")
-        req.add_header("Content-Type", "application/json")
-        
-        data_bytes = json.dumps(payload).encode('utf-8')
+        res_json = llm_client.chat_completion(build_llm_payload(messages))
         
-        # 10 second timeout
-        with urllib.request.urlopen(req, data_bytes, timeout=10) as response:
-            res_body = response.read().decode('utf-8')
-            res_json = json.loads(res_body)
-            
-            choices = res_json.get("choices", [])
-            if not choices:
-                return None
-                
-            content = choices[0].get("message", {}).get("content", "").strip()
-            
-            # Clean up potential markdown blocks
-            if content.startswith("```"):
-                content = re.sub(r'^```(?:json)?\s*', '', content)
-                content = re.sub(r'\s*```$', '', content)
-                content = content.strip()
-                
-            workout_data = json.loads(content)
+        choices = res_json.get("choices", [])
+        if not choices:
+            return None
             
-            if "exercises" in workout_data and isinstance(workout_data["exercises"], list):
-                total_time = 0
-                for ex in workout_data["exercises"]:
-                    ex["duration"] = float(ex.get("duration", 0.5))
-                    total_time += ex["duration"]
-                
-                workout_data["total_duration"] = round(total_time, 1)
-                workout_data["explanation"] = workout_data.get("explanation", "Custom workout designed to fit your goals.")
-                workout_data["success"] = True
-                return workout_data
+        content = choices[0].get("message", {}).get("content", "")
+        return parse_llm_workout(content, candidates)
                 
     except Exception as e:
         print(f"LM Studio API Call Failed: {e}")
         
     return None
 
+def stream_workout_via_llm(domains, duration, difficulty, focus, candidates, goal=None):
+    """Stream a workout from the LLM as ('exercise', exercise) items.
+
+    Each exercise is yielded as soon as it is complete in the token stream.
+    The last item is ('done', workout), with workout None on failure.
+    """
+    messages = build_llm_messages(domains, duration, difficulty, focus, candidates, goal)
+    parser = IncrementalExerciseParser()
+    try:
+        lines = llm_client.stream_chat_completion(build_llm_payload(messages))
+        for fragment in iter_completion_deltas(lines):
+            for exercise in parser.feed(fragment):
+                exercise = expand_exercise(exercise, candidates.by_id)
+                exercise["duration"] = float(exercise.get("duration", 0.5))
+                yield 'exercise', exercise
+        yield 'done', parse_llm_workout(parser.text, candidates)
+    except Exception as e:
+        print(f"LM Studio streaming call failed: {e}")
+        yield 'done', None
+
+# Map planner domain values to exercise categories
+DOMAIN_TO_CATEGORY = {
+    'strength_power': 'Strength & Power',
+    'speed_mobility': 'Speed & Mobility', 
+    'endurance': 'Endurance',
+    'agility': 'Agility',
+    'cognition': 'Cognition',
+    # Handle the values that the planner actually sends
+    'Strength': 'Strength & Power',
+    'Speed & Mobility': 'Speed & Mobility',
+    'Endurance': 'Endurance',
+    'Agility': 'Agility',
+    'Cognitive': 'Cognition'
+}
+
+# Prompt-size totals for compacted LLM candidates
+prompt_stats = PromptStats()
+
+# Background generation: answer with the rule-based workout right away and
+# let clients poll /api/generate-workout/<workout_id> for the LLM version.
+# Results are shared through the database, so any worker can answer a poll.
+LLM_BACKGROUND_GENERATION = os.environ.get('LLM_BACKGROUND_GENERATION', '0') == '1'
+generation_jobs = GenerationJobs(
+    max_workers=int(os.environ.get('LLM_WORKERS', 2)),
+    ttl=int(os.environ.get('LLM_JOB_TTL', 600)),
+    max_pending=int(os.environ.get('LLM_MAX_PENDING', 20)),
+    connect=get_db_connection
+)
+
+# Longest workout the planner may request, in minutes
+MAX_WORKOUT_MINUTES = int(os.environ.get('MAX_WORKOUT_MINUTES', 180))
+
+def parse_workout_duration(data):
+    """Requested workout length in minutes; ValueError with a message the planner can show."""
+    try:
+        duration = int(data.get('duration', 15))
+    except (TypeError, ValueError):
+        raise ValueError('Duration must be a whole number of minutes')
+    if not 1 <= duration <= MAX_WORKOUT_MINUTES:
+        raise ValueError(f'Duration must be between 1 and {MAX_WORKOUT_MINUTES} minutes')
+    return duration
+
+def new_workout_id():
+    """Create a unique id for a generated workout."""
+    return f"workout_{datetime.now().strftime('%Y%m%d%H%M%S')}_{secrets.token_hex(3)}"
+
+def build_llm_candidates(catalog, categories, duration, difficulty, focus='', goal=''):
+    """Prepare the compacted candidate exercises sent to the LLM.
+
+    Exercises matching the focus and goal text are moved to the front, so
+    they survive the candidate cap.
+    """
+    exercises = lookup_exercises(catalog.index, categories)
+    text = f"{focus or ''} {goal or ''}".strip()
+    if text:
+        conn = get_db_connection()
+        try:
+            exercises = prerank(exercises, rank_ids(conn, text, categories))
+        finally:
+            conn.close()
+    candidates = compact_candidates(exercises, duration, difficulty)
+    prompt_stats.record(candidates.metrics)
+    metrics = candidates.metrics
+    print(f"LLM candidates: {metrics['candidates_before']} -> {metrics['candidates_after']} exercises, "
+          f"{metrics['chars_before']} -> {metrics['chars_after']} chars")
+    return candidates
+
+def run_llm_generation(cache_key, domains, duration, difficulty, focus, candidates, goal):
+    """Generate a workout with the LLM and cache it if it succeeds."""
+    llm_workout = generate_workout_via_llm(domains, duration, difficulty, focus, candidates, goal)
+    if llm_workout:
+        llm_response_cache.put(cache_key, llm_workout)
+    return llm_workout
+
+def build_fallback_workout(catalog, categories, domains, duration, difficulty, focus):
+    """Build a workout with the rule-based selector."""
+    # FALLBACK: Create explanation
+    fallback_explanation = f"A {difficulty} level workout session focusing on {', '.join(domains)} domains"
+    if focus:
+        fallback_explanation += f" with a focus on {focus}."
+    else:
+        fallback_explanation += "."
+
+    # FALLBACK: Look up matching exercises in the prebuilt category/difficulty index.
+    # Buckets are already sorted by duration, so this is a lookup and a merge.
+    filtered_exercises = lookup_exercises(catalog.index, categories, difficulty)
+
+    # If no exercises match criteria, try with just category match
+    if not filtered_exercises:
+        filtered_exercises = lookup_exercises(catalog.index, categories)
+
+    # Select exercises to fit duration
+    selected_exercises, total_time = select_exercises(filtered_exercises, duration, categories=categories)
+
+    # If still no exercises, return at least one from the selected domain
+    if not selected_exercises and filtered_exercises:
+        selected_exercises = [filtered_exercises[0]]
+        total_time = filtered_exercises[0]['duration']
+
+    # Copy the shared catalog entries; values from SQLite are never NaN
+    cleaned_exercises = [dict(exercise) for exercise in selected_exercises]
+
+    return {
+        'success': True,
+        'exercises': cleaned_exercises,
+        'total_duration': round(total_time, 1),
+        'difficulty': difficulty,
+        'explanation': fallback_explanation
+    }
+
+# Timed work/rest plans, shared by workouts with the same exercises
+session_plans = SessionPlanCache(max_size=int(os.environ.get('SESSION_PLAN_CACHE_SIZE', 512)))
+
+def with_session_plan(workout):
+    """Copy of a workout with its timed work/rest plan for the session page."""
+    version = data_registry.version
+    plan = session_plans.get_or_build(workout.get('exercises') or [], workout.get('difficulty'),
+                                      data_registry.get('rest_times'), version)
+    return dict(workout, session_plan=plan)
+
 @app.route('/api/generate-workout', methods=['POST'])
 def api_generate_workout():
     """Generate a custom workout based on user preferences."""
@@ -433,139 +655,113 @@ def api_generate_workout():
             return jsonify({'error': 'No JSON data received'}), 400
         
         domains = data.get('domains', [])
-        duration = int(data.get('duration', 15))
+        duration = parse_workout_duration(data)
         difficulty = data.get('difficulty', 'beginner')
         goal = data.get('goal', '')
+        focus = data.get('focus', '')
+        background = bool(data.get('background', LLM_BACKGROUND_GENERATION))
 
-        # Fetch exercises from database
+        # Fetch exercises from the catalog cache
         try:
-            db_exercises = get_all_exercises_from_db()
+            catalog = exercise_catalog.snapshot()
         except Exception as e:
             return jsonify({'error': f'Database error: {str(e)}'}), 500
 
-        if not db_exercises:
+        if not catalog.exercises:
             return jsonify({'error': 'No exercise data available'}), 400
 
-        # Create domain to category mapping
-        domain_to_category = {
-            'strength_power': 'Strength & Power',
-            'speed_mobility': 'Speed & Mobility', 
-            'endurance': 'Endurance',
-            'agility': 'Agility',
-            'cognition': 'Cognition',
-            # Handle the values that the planner actually sends
-            'Strength': 'Strength & Power',
-            'Speed & Mobility': 'Speed & Mobility',
-            'Endurance': 'Endurance',
-            'Agility': 'Agility',
-            'Cognitive': 'Cognition'
-        }
-
-        # First, prepare candidates for LLM
-        llm_categories = [domain_to_category[d] for d in domains if d in domain_to_category]
-        candidates = []
-        for ex in db_exercises:
-            if ex.get('category') in llm_categories:
-                candidates.append({
-                    'name': ex.get('name'),
-                    'category': ex.get('category'),
-                    'duration': ex.get('duration', 0.5),
-                    'difficulty': ex.get('difficulty', 'beginner'),
-                    'description': ex.get('description', ''),
-                    'target_muscles': ex.get('target_muscles', '')
-                })
-
-        # Try local LLM generation
-        focus = data.get('focus', '')
-        llm_workout = generate_workout_via_llm(domains, duration, difficulty, focus, candidates, goal)
+        categories = [DOMAIN_TO_CATEGORY[d] for d in domains if d in DOMAIN_TO_CATEGORY]
+
+        # Try local LLM generation, reusing a cached response for identical requests
+        cache_key = make_cache_key(domains, duration, difficulty, focus, goal, exercise_catalog.fingerprint(catalog))
+        llm_workout = llm_response_cache.get(cache_key)
+        if llm_workout is None:
+            candidates = build_llm_candidates(catalog, categories, duration, difficulty, focus, goal)
+            if background:
+                # Answer with the rule-based workout now and refine it off the request thread
+                workout = build_fallback_workout(catalog, categories, domains, duration, difficulty, focus)
+                workout['workout_id'] = new_workout_id()
+                # With too many generations pending the rule-based workout is the answer
+                if generation_jobs.submit(workout['workout_id'], run_llm_generation,
+                                          cache_key, domains, duration, difficulty, focus, candidates, goal) is not None:
+                    workout['status'] = 'pending'
+                return jsonify(with_session_plan(workout))
+            llm_workout = run_llm_generation(cache_key, domains, duration, difficulty, focus, candidates, goal)
         if llm_workout:
-            llm_workout['workout_id'] = f"workout_{datetime.now().strftime('%Y%m%d%H%M%S')}"
-            return jsonify(llm_workout)
+            llm_workout['workout_id'] = new_workout_id()
+            return jsonify(with_session_plan(llm_workout))
 
-        # FALLBACK: Create explanation
-        fallback_explanation = f"A {difficulty} level workout session focusing on {', '.join(domains)} domains"
-        if focus:
-            fallback_explanation += f" with a focus on {focus}."
-        else:
-            fallback_explanation += "."
-
-        # FALLBACK: Filter exercises based on criteria (original rule-based logic)
-        filtered_exercises = []
-        for exercise in db_exercises:
-            # Check if exercise category matches any selected domain
-            category_match = False
-            for domain in domains:
-                if domain in domain_to_category and domain_to_category[domain] == exercise['category']:
-                    category_match = True
-                    break
-            
-            # Check difficulty match
-            difficulty_match = difficulty.lower() in exercise['difficulty'].lower()
-
-            if category_match and difficulty_match:
-                filtered_exercises.append(exercise)
-
-        # If no exercises match criteria, try with just category match
-        if not filtered_exercises:
-            for exercise in db_exercises:
-                category_match = False
-                for domain in domains:
-                    if domain in domain_to_category and domain_to_category[domain] == exercise['category']:
-                        category_match = True
-                        break
-                
-                if category_match:
-                    filtered_exercises.append(exercise)
-
-        # If still no exercises, return exercises from the first selected domain
-        if not filtered_exercises and domains:
-            first_domain = domains[0]
-            if first_domain in domain_to_category:
-                category = domain_to_category[first_domain]
-                filtered_exercises = [ex for ex in db_exercises 
-                                    if ex['category'] == category]
-
-        # Select exercises to fit duration
-        selected_exercises = []
-        total_time = 0
-        
-        # Sort exercises by duration to get a good mix
-        filtered_exercises.sort(key=lambda x: x['duration'])
-        
-        for exercise in filtered_exercises:
-            if total_time + exercise['duration'] <= duration:
-                selected_exercises.append(exercise)
-                total_time += exercise['duration']
-            if total_time >= duration:
-                break
-
-        # If still no exercises, return at least one from the selected domain
-        if not selected_exercises and filtered_exercises:
-            selected_exercises = [filtered_exercises[0]]
-            total_time = filtered_exercises[0]['duration']
-
-        # Clean NaN values from exercises before JSON serialization
-        cleaned_exercises = []
-        for exercise in selected_exercises:
-            cleaned_exercise = {}
-            for key, value in exercise.items():
-                if pd.isna(value):
-                    cleaned_exercise[key] = None
-                else:
-                    cleaned_exercise[key] = value
-            cleaned_exercises.append(cleaned_exercise)
+        workout = build_fallback_workout(catalog, categories, domains, duration, difficulty, focus)
+        workout['workout_id'] = new_workout_id()
+        return jsonify(with_session_plan(workout))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 400
 
-        return jsonify({
-            'success': True,
-            'exercises': cleaned_exercises,
-            'total_duration': round(total_time, 1),
-            'difficulty': difficulty,
-            'explanation': fallback_explanation,
-            'workout_id': f"workout_{datetime.now().strftime('%Y%m%d%H%M%S')}"
-        })
+@app.route('/api/generate-workout/stream', methods=['POST'])
+def api_generate_workout_stream():
+    """Stream a generated workout to the planner as Server-Sent Events.
+
+    Sends one 'exercise' event per exercise as the LLM produces it, then a
+    'done' event with the complete workout (the rule-based one if the LLM
+    fails, in which case clients should replace what they have shown).
+    """
+    data = request.get_json(silent=True)
+    if not data:
+        return jsonify({'error': 'No JSON data received'}), 400
+
+    try:
+        domains = data.get('domains', [])
+        duration = parse_workout_duration(data)
+        difficulty = data.get('difficulty', 'beginner')
+        goal = data.get('goal', '')
+        focus = data.get('focus', '')
+        catalog = exercise_catalog.snapshot()
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
+    if not catalog.exercises:
+        return jsonify({'error': 'No exercise data available'}), 400
+
+    categories = [DOMAIN_TO_CATEGORY[d] for d in domains if d in DOMAIN_TO_CATEGORY]
+    cache_key = make_cache_key(domains, duration, difficulty, focus, goal, exercise_catalog.fingerprint(catalog))
+    cached_workout = llm_response_cache.get(cache_key)
+    workout_id = new_workout_id()
+
+    def generate():
+        llm_workout = cached_workout
+        if llm_workout is None:
+            candidates = build_llm_candidates(catalog, categories, duration, difficulty, focus, goal)
+            for kind, item in stream_workout_via_llm(domains, duration, difficulty, focus, candidates, goal):
+                if kind == 'exercise':
+                    yield format_sse('exercise', item)
+                else:
+                    llm_workout = item
+            if llm_workout:
+                llm_response_cache.put(cache_key, llm_workout)
+        else:
+            for exercise in llm_workout['exercises']:
+                yield format_sse('exercise', exercise)
+
+        if not llm_workout:
+            llm_workout = build_fallback_workout(catalog, categories, domains, duration, difficulty, focus)
+        llm_workout['workout_id'] = workout_id
+        yield format_sse('done', with_session_plan(llm_workout))
+
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/api/generate-workout/<workout_id>')
+def api_generate_workout_status(workout_id):
+    """Poll a background generation for its LLM-refined workout."""
+    status, llm_workout = generation_jobs.status(workout_id)
+    if status == 'unknown':
+        return jsonify({'status': status, 'error': 'Unknown or expired workout id'}), 404
+
+    response = {'status': status, 'workout_id': workout_id}
+    if llm_workout:
+        response['workout'] = with_session_plan(dict(llm_workout, workout_id=workout_id))
+    return jsonify(response)
+
 @app.route('/api/exercises/add', methods=['POST'])
 def api_add_exercise():
     """Add a custom exercise to the library."""
@@ -587,15 +783,18 @@ def api_add_exercise():
 
         # Save to database
         conn = get_db_connection()
-        conn.execute('''
+        cursor = conn.execute('''
             INSERT INTO exercises (category, exercise_name, duration_minutes, 
-                                 primary_benefit, secondary_benefit, difficulty_level, instructions)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (category, name, duration, description, target_muscles, difficulty, instructions))
+                                 primary_benefit, secondary_benefit, difficulty_level, instructions, source)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (category, name, duration, description, target_muscles, difficulty, instructions, SOURCE_CUSTOM))
+        exercise_id = cursor.lastrowid
+        source_version = bump_catalog_version(conn)
         conn.commit()
         conn.close()
         
         new_ex = {
+            'id': exercise_id,
             'category': category,
             'name': name,
             'duration': duration,
@@ -604,6 +803,7 @@ def api_add_exercise():
             'difficulty': difficulty,
             'instructions': instructions
         }
+        exercise_catalog.add(new_ex, source_version)
         return jsonify({'success': True, 'exercise': new_ex})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -625,61 +825,142 @@ def api_save_workout():
         
         if not name or not exercises:
             return jsonify({'success': False, 'error': 'Workout name and exercises are required'}), 400
+        if not isinstance(exercises, list) or not all(isinstance(ex, dict) for ex in exercises):
+            return jsonify({'success': False, 'error': 'exercises must be a list of objects'}), 400
 
         conn = get_db_connection()
-        conn.execute('''
-            INSERT INTO saved_workouts (user_id, workout_name, workout_description, exercises_json, total_duration, difficulty)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (user_id, name, description, json.dumps(exercises), duration, difficulty))
-        conn.commit()
-        conn.close()
-        
-        return jsonify({'success': True})
+        try:
+            workout_id = save_workout(conn, user_id, name, description, exercises, duration, difficulty)
+        finally:
+            conn.close()
+
+        return jsonify({'success': True, 'id': workout_id})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/api/workouts/saved', methods=['GET'])
 def api_list_saved_workouts():
-    """Get all saved workouts for the current user."""
+    """List the current user's saved workouts as summaries, a page at a time."""
+    try:
+        page = max(int(request.args.get('page', 1)), 1)
+        per_page = min(max(int(request.args.get('per_page', 12)), 1), 100)
+    except ValueError:
+        return jsonify({'success': False, 'error': 'page and per_page must be integers'}), 400
     try:
         user_id = str(session.get('user_id', 'guest'))
         conn = get_db_connection()
-        rows = conn.execute('''
-            SELECT id, workout_name, workout_description, exercises_json, total_duration, difficulty, created_date
-            FROM saved_workouts
-            WHERE user_id = ?
-            ORDER BY created_date DESC
-        ''', (user_id,)).fetchall()
-        conn.close()
-        
-        saved = []
-        for r in rows:
-            saved.append({
-                'id': r['id'],
-                'workout_name': r['workout_name'],
-                'workout_description': r['workout_description'],
-                'exercises': json.loads(r['exercises_json']),
-                'total_duration': r['total_duration'],
-                'difficulty': r['difficulty'],
-                'created_date': r['created_date']
-            })
-            
-        return jsonify({'success': True, 'saved_workouts': saved})
+        try:
+            # Fetch one extra row to tell whether another page exists
+            saved = list_workouts(conn, user_id, per_page + 1, (page - 1) * per_page)
+        finally:
+            conn.close()
+        return jsonify({
+            'success': True,
+            'saved_workouts': saved[:per_page],
+            'page': page,
+            'per_page': per_page,
+            'has_more': len(saved) > per_page
+        })
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@app.route('/api/workouts/saved/<int:workout_id>', methods=['GET'])
+def api_get_saved_workout(workout_id):
+    """Get one of the current user's saved workouts with its exercises."""
+    try:
+        user_id = str(session.get('user_id', 'guest'))
+        conn = get_db_connection()
+        try:
+            workout = load_workout(conn, user_id, workout_id)
+        finally:
+            conn.close()
+        if workout is None:
+            return jsonify({'success': False, 'error': 'Workout not found'}), 404
+        return jsonify({'success': True, 'workout': with_session_plan(workout)})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+def save_completed_session(conn, completion):
+    """Write a completed session and everything derived from it on ``conn``.
+
+    The caller owns the transaction; ``completion`` is (user_id, data, day, timezone).
+    """
+    user_id, data, day, timezone = completion
+    conn.execute('''
+        INSERT INTO user_sessions (user_id, session_date, exercises_completed, total_duration, session_type,
+                                   domain_progress)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', (user_id, day.isoformat(), json.dumps(data.get('exercises', [])),
+          data.get('totalDuration', 0), data.get('sessionType', 'custom'),
+          json.dumps(data.get('domainProgress', {}))))
+
+    # Update user progress, the weekly rollup and the streak in the same transaction
+    update_user_progress(user_id, data, conn)
+    record_session(conn, user_id, data.get('domainProgress', {}), day.isoformat())
+    bump_user_version(conn, user_id)
+    streak = record_activity(conn, user_id, day, timezone)
+    conn.execute('''
+        UPDATE user_progress SET streak_days = ?, last_session_date = ? WHERE user_id = ?
+    ''', (streak, day.isoformat(), user_id))
+
+# Per-user dashboard results, checked against the user's data version on every read
+dashboard_cache = DashboardCache(ttl=int(os.environ.get('DASHBOARD_CACHE_TTL', 30)))
+
+def invalidate_dashboards(completions):
+    """Forget cached dashboards of the users whose sessions were just committed."""
+    for user_id, _, _, _ in completions:
+        dashboard_cache.invalidate(user_id)
+
+# Optional write-behind mode: completions are acknowledged once queued and a
+# single writer thread group-commits them, instead of one commit per request
+SESSION_WRITE_BEHIND = os.environ.get('SESSION_WRITE_BEHIND', '0') == '1'
+session_writes = WriteBehindQueue(
+    save_completed_session,
+    connect=get_db_connection,
+    on_commit=invalidate_dashboards,
+    max_size=int(os.environ.get('SESSION_QUEUE_SIZE', 1000)),
+    batch_size=int(os.environ.get('SESSION_BATCH_SIZE', 100)),
+    max_delay=float(os.environ.get('SESSION_BATCH_DELAY_MS', 50)) / 1000
+)
+# Commit whatever is still queued before the process exits
+atexit.register(session_writes.flush, 10)
+
+def validate_completion(data):
+    """Return an error message if a completion payload is malformed, else None."""
+    if not isinstance(data, dict):
+        return 'Expected a JSON object'
+    if not isinstance(data.get('exercises', []), list):
+        return 'exercises must be a list'
+    domain_progress = data.get('domainProgress', {})
+    if not isinstance(domain_progress, dict) or not all(isinstance(p, dict) for p in domain_progress.values()):
+        return 'domainProgress must map domains to objects'
+    if not isinstance(data.get('totalDuration', 0), (int, float)):
+        return 'totalDuration must be a number'
+    return None
+
 @app.route('/api/complete_session', methods=['POST'])
 def api_complete_session():
     """Record a completed training session."""
-    data = request.get_json()
+    data = request.get_json(silent=True)
     user_id = session.get('user_id', 'guest')
 
+    error = validate_completion(data)
+    if error:
+        return jsonify({'status': 'error', 'message': error}), 400
+
     try:
+        # Session days follow the user's timezone so streaks break at their midnight
+        timezone = resolve_timezone(data.get('timezone')).key
+        day = local_day(timezone)
+
         if user_id == 'guest':
             # Update session data for guest users
             total_duration = data.get('totalDuration', 0)
             session['weekly_minutes'] = session.get('weekly_minutes', 0) + total_duration
-            session['streak'] = session.get('streak', 0) + 1
+            last_day = session.get('last_session_day')
+            session['streak'] = next_streak(session.get('streak', 0), date.fromisoformat(last_day) if last_day else None, day)
+            session['last_session_day'] = max(day.isoformat(), last_day or '')
+            session['timezone'] = timezone
 
             # Update domain progress using domainProgress data structure
             domain_progress = session.get('domain_progress', {})
@@ -694,7 +975,7 @@ def api_complete_session():
             # Store recent sessions for guest users
             recent_sessions = session.get('recent_sessions', [])
             new_session = {
-                'session_date': datetime.now().strftime('%Y-%m-%d'),
+                'session_date': day.isoformat(),
                 'total_duration': total_duration,
                 'session_type': data.get('sessionType', 'custom')
             }
@@ -705,21 +986,17 @@ def api_complete_session():
 
             return jsonify({'status': 'success', 'message': 'Session recorded for guest user'})
 
+        completion = (user_id, data, day, timezone)
+        # A full queue falls back to a synchronous write
+        if SESSION_WRITE_BEHIND and session_writes.submit(completion):
+            return jsonify({'status': 'success', 'message': 'Session queued for saving', 'queued': True}), 202
+
         # For logged-in users, save to database
         conn = get_db_connection()
-        # Save session record
-        # Save session
-        conn.execute('''
-            INSERT INTO user_sessions (user_id, exercises_completed, total_duration, session_type)
-            VALUES (?, ?, ?, ?)
-        ''', (user_id, json.dumps(data.get('exercises', [])), 
-              data.get('totalDuration', 0), data.get('sessionType', 'custom')))
-
-        # Update user progress
-        update_user_progress(user_id, data, conn)
-
+        save_completed_session(conn, completion)
         conn.commit()
         conn.close()
+        invalidate_dashboards([completion])
 
         return jsonify({'status': 'success', 'message': 'Session recorded successfully'})
     
@@ -736,6 +1013,37 @@ def api_user_progress():
     progress_data = get_user_progress_data(user_id)
     return jsonify(progress_data)
 
+@app.route('/api/user_programs', methods=['GET', 'POST'])
+def api_user_programs():
+    """Get or set the programs a user follows, in priority order."""
+    user_id = session.get('user_id', 'guest')
+    available = program_ids(data_registry.get('program_index'))
+
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        selected = data.get('program_ids')
+        if not isinstance(selected, list) or not selected:
+            return jsonify({'status': 'error', 'message': 'program_ids must be a non-empty list'}), 400
+        selected = list(dict.fromkeys(str(p) for p in selected))
+        unknown = [p for p in selected if p not in available]
+        if unknown:
+            return jsonify({'status': 'error', 'message': f"Unknown programs: {', '.join(unknown)}"}), 400
+
+        if user_id == 'guest':
+            session['program_ids'] = selected
+        else:
+            conn = get_db_connection()
+            conn.execute('DELETE FROM user_programs WHERE user_id = ?', (user_id,))
+            conn.executemany('''
+                INSERT INTO user_programs (user_id, program_id, position) VALUES (?, ?, ?)
+            ''', [(user_id, program_id, position) for position, program_id in enumerate(selected)])
+            bump_user_version(conn, user_id)
+            conn.commit()
+            conn.close()
+            dashboard_cache.invalidate(user_id)
+
+    return jsonify({'program_ids': get_dashboard(user_id).program_ids, 'available': available})
+
 @app.route('/api/user_stats')
 def api_user_stats():
     """Get user statistics."""
@@ -746,16 +1054,32 @@ def api_user_stats():
 @app.route('/api/debug')
 def api_debug():
     """Debug endpoint to check data loading."""
+    training_data = data_registry.get('training_data')
     return jsonify({
         'training_data_loaded': bool(training_data),
         'exercises_count': len(training_data.get('exercises', [])) if training_data else 0,
-        'sample_exercise': training_data.get('exercises', [{}])[0] if training_data and training_data.get('exercises') else None
+        'sample_exercise': training_data.get('exercises', [{}])[0] if training_data and training_data.get('exercises') else None,
+        'catalog_cache': exercise_catalog.stats(),
+        'llm_cache': llm_response_cache.stats(),
+        'llm_jobs': generation_jobs.stats(),
+        'llm_client': llm_client.stats(),
+        'llm_prompt': prompt_stats.stats(),
+        'db': db_connections.stats(),
+        'session_writes': session_writes.stats(),
+        'dashboard_cache': dashboard_cache.stats(),
+        'data': data_registry.stats(),
+        'data_watcher': data_watcher.stats(),
+        'response_cache': response_payloads.stats(),
+        'session_plans': session_plans.stats()
     })
 
 @app.route('/api/rest-times')
 def api_rest_times():
     """Get rest times for different categories and difficulty levels."""
-    return jsonify({'rest_times': rest_times})
+    # Read the version first so a concurrent reload can't be cached under the new key
+    version = data_registry.version
+    rest_times = data_registry.get('rest_times')
+    return response_payloads.respond(request, ('rest_times', version), lambda: {'rest_times': rest_times})
 
 @app.route('/api/health')
 def api_health():
@@ -764,184 +1088,35 @@ def api_health():
 
 def get_domain_key(category):
     """Convert category to domain key."""
-    mapping = {
-        'strength': 'strength_power',
-        'strength & power': 'strength_power',
-        'speed': 'speed_mobility',
-        'speed & mobility': 'speed_mobility',
-        'mobility': 'speed_mobility',
-        'endurance': 'endurance',
-        'agility': 'agility',
-        'cognitive': 'cognition',
-        'cognition': 'cognition'
-    }
-    return mapping.get(category.lower())
+    return DOMAIN_KEYS.get(category.lower())
 
-def get_user_stats(user_id):
-    """Get user statistics from database or session."""
-    if user_id == 'guest':
-        return {
-            'current_week': session.get('current_week', 1),
-            'streak': session.get('streak', 0),
-            'weekly_minutes': session.get('weekly_minutes', 0),
-            'total_sessions': 0,
-            'domain_progress': session.get('domain_progress', {})
-        }
+def get_dashboard(user_id):
+    """Everything the dashboard, progress and stats views show for a user."""
+    if user_id == 'guest' or user_id is None:
+        return guest_dashboard(session)
 
-    # For logged-in users, get from database
-    conn = get_db_connection()
-
-    # Get basic progress
-    progress = conn.execute('''
-        SELECT current_week, streak_days, total_minutes 
-        FROM user_progress 
-        WHERE user_id = ? 
-        LIMIT 1
-    ''', (user_id,)).fetchone()
-
-    # Get total sessions
-    sessions = conn.execute('''
-        SELECT COUNT(*) as total 
-        FROM user_sessions 
-        WHERE user_id = ?
-    ''', (user_id,)).fetchone()
-
-    # Get domain progress
-    domain_progress = {}
-    domains = conn.execute('''
-        SELECT domain, sessions_completed 
-        FROM user_progress 
-        WHERE user_id = ?
-    ''', (user_id,)).fetchall()
-
-    for domain in domains:
-        domain_progress[domain['domain']] = domain['sessions_completed']
+    def load():
+        conn = get_db_connection()
+        try:
+            return load_dashboard(conn, user_id)
+        finally:
+            conn.close()
 
-    conn.close()
+    # Another worker may have committed a session since this one cached the dashboard
+    conn = get_db_connection()
+    try:
+        version = user_version(conn, user_id)
+    finally:
+        conn.close()
+    return dashboard_cache.get_or_load(user_id, load, version)
 
-    if progress:
-        return {
-            'current_week': progress['current_week'],
-            'streak': progress['streak_days'],
-            'weekly_minutes': progress['total_minutes'],
-            'total_sessions': sessions['total'] if sessions else 0,
-            'domain_progress': domain_progress
-        }
-    else:
-        return {
-            'current_week': 1,
-            'streak': 0,
-            'weekly_minutes': 0,
-            'total_sessions': 0,
-            'domain_progress': {}
-        }
+def get_user_stats(user_id):
+    """Get user statistics from database or session."""
+    return get_dashboard(user_id).stats
 
 def get_user_progress_data(user_id):
     """Get detailed progress data for charts."""
-    if user_id == 'guest':
-        # For guest users, use session data
-        domain_progress = session.get('domain_progress', {})
-        weekly_minutes = session.get('weekly_minutes', 0)
-        streak = session.get('streak', 0)
-        recent_sessions = session.get('recent_sessions', [])
-        
-        # Create domain-specific data structure with proper domain key mapping
-        domains = {
-            'strength_power': {'sessions': domain_progress.get('strength_power', 0), 'minutes': domain_progress.get('strength_power', 0) * 10, 'week': 1, 'progress': min(domain_progress.get('strength_power', 0) * 10, 100)},
-            'speed_mobility': {'sessions': domain_progress.get('speed_mobility', 0), 'minutes': domain_progress.get('speed_mobility', 0) * 10, 'week': 1, 'progress': min(domain_progress.get('speed_mobility', 0) * 10, 100)},
-            'endurance': {'sessions': domain_progress.get('endurance', 0), 'minutes': domain_progress.get('endurance', 0) * 10, 'week': 1, 'progress': min(domain_progress.get('endurance', 0) * 10, 100)},
-            'agility': {'sessions': domain_progress.get('agility', 0), 'minutes': domain_progress.get('agility', 0) * 10, 'week': 1, 'progress': min(domain_progress.get('agility', 0) * 10, 100)},
-            'cognition': {'sessions': domain_progress.get('cognition', 0), 'minutes': domain_progress.get('cognition', 0) * 10, 'week': 1, 'progress': min(domain_progress.get('cognition', 0) * 10, 100)}
-        }
-        
-        return {
-            'total_sessions': sum(domain_progress.values()),
-            'total_minutes': weekly_minutes,
-            'current_streak': streak,
-            'avg_session_length': 15 if sum(domain_progress.values()) > 0 else 0,
-            'weekly_progress': [weekly_minutes, 0, 0, 0],  # 4 weeks of data
-            'recent_sessions': recent_sessions,
-            'strength': domains['strength_power'],
-            'speed_mobility': domains['speed_mobility'],
-            'endurance': domains['endurance'],
-            'agility': domains['agility'],
-            'cognitive': domains['cognition']
-        }
-
-    # For logged-in users, get from database
-    conn = get_db_connection()
-
-    # Get recent sessions
-    sessions = conn.execute('''
-        SELECT session_date, total_duration, session_type 
-        FROM user_sessions 
-        WHERE user_id = ? 
-        ORDER BY session_date DESC 
-        LIMIT 10
-    ''', (user_id,)).fetchall()
-
-    # Get domain progress
-    domain_progress = {}
-    domains_data = conn.execute('''
-        SELECT domain, sessions_completed, total_minutes 
-        FROM user_progress 
-        WHERE user_id = ?
-    ''', (user_id,)).fetchall()
-
-    for domain in domains_data:
-        domain_progress[domain['domain']] = {
-            'sessions': domain['sessions_completed'],
-            'minutes': domain['total_minutes'],
-            'week': 1,  # Default week
-            'progress': min(domain['total_minutes'], 100)  # Progress based on minutes
-        }
-
-    # Get total stats
-    total_sessions = sum(d['sessions'] for d in domain_progress.values())
-    total_minutes = sum(d['minutes'] for d in domain_progress.values())
-    
-    # Create domain structure with defaults
-    domains = {
-        'strength_power': domain_progress.get('strength_power', {'sessions': 0, 'minutes': 0, 'week': 1, 'progress': 0}),
-        'speed_mobility': domain_progress.get('speed_mobility', {'sessions': 0, 'minutes': 0, 'week': 1, 'progress': 0}),
-        'endurance': domain_progress.get('endurance', {'sessions': 0, 'minutes': 0, 'week': 1, 'progress': 0}),
-        'agility': domain_progress.get('agility', {'sessions': 0, 'minutes': 0, 'week': 1, 'progress': 0}),
-        'cognition': domain_progress.get('cognition', {'sessions': 0, 'minutes': 0, 'week': 1, 'progress': 0})
-    }
-
-    # Compute streak from consecutive session dates
-    streak = 0
-    if sessions:
-        today = datetime.now().date()
-        prev = today
-        for s in sessions:
-            try:
-                d = datetime.strptime(str(s['session_date']), '%Y-%m-%d').date()
-                if (prev - d).days <= 1:
-                    streak += 1
-                    prev = d
-                else:
-                    break
-            except Exception:
-                break
-
-    avg_length = round(total_minutes / total_sessions) if total_sessions > 0 else 0
-
-    conn.close()
-
-    return {
-        'total_sessions': total_sessions,
-        'total_minutes': total_minutes,
-        'current_streak': streak,
-        'avg_session_length': avg_length,
-        'weekly_progress': [total_minutes, 0, 0, 0],
-        'recent_sessions': [dict(s) for s in sessions],
-        'strength': domains['strength_power'],
-        'speed_mobility': domains['speed_mobility'],
-        'endurance': domains['endurance'],
-        'agility': domains['agility'],
-        'cognitive': domains['cognition']
-    }
+    return get_dashboard(user_id).progress
 
 def update_user_progress(user_id, session_data, conn=None):
     """Update user progress after completing a session."""
@@ -950,28 +1125,21 @@ def update_user_progress(user_id, session_data, conn=None):
         conn = get_db_connection()
         close_conn = True
 
-    # Update or insert domain progress based on domainProgress data
+    # Upsert every domain in one batch; relies on the UNIQUE (user_id, domain) index
     domain_progress = session_data.get('domainProgress', {})
-
-    for domain, progress_data in domain_progress.items():
-        if progress_data.get('exercises', 0) > 0:
-            existing = conn.execute('''
-                SELECT id FROM user_progress WHERE user_id = ? AND domain = ?
-            ''', (user_id, domain)).fetchone()
-
-            if existing:
-                conn.execute('''
-                    UPDATE user_progress
-                    SET sessions_completed = sessions_completed + ?,
-                        total_minutes = total_minutes + ?,
-                        last_session_date = CURRENT_DATE
-                    WHERE user_id = ? AND domain = ?
-                ''', (progress_data.get('exercises', 0), progress_data.get('minutes', 0), user_id, domain))
-            else:
-                conn.execute('''
-                    INSERT INTO user_progress (user_id, domain, sessions_completed, total_minutes, last_session_date)
-                    VALUES (?, ?, ?, ?, CURRENT_DATE)
-                ''', (user_id, domain, progress_data.get('exercises', 0), progress_data.get('minutes', 0)))
+    rows = [
+        (user_id, domain, progress_data.get('exercises', 0), progress_data.get('minutes', 0))
+        for domain, progress_data in domain_progress.items()
+        if progress_data.get('exercises', 0) > 0
+    ]
+    conn.executemany('''
+        INSERT INTO user_progress (user_id, domain, sessions_completed, total_minutes, last_session_date)
+        VALUES (?, ?, ?, ?, CURRENT_DATE)
+        ON CONFLICT (user_id, domain) DO UPDATE SET
+            sessions_completed = sessions_completed + excluded.sessions_completed,
+            total_minutes = total_minutes + excluded.total_minutes,
+            last_session_date = excluded.last_session_date
+    ''', rows)
 
     if close_conn:
         conn.commit()
@@ -1057,7 +1225,34 @@ def logout():
     flash('You have been logged out', 'info')
     return redirect(url_for('index'))
 
+@app.cli.command('check-query-plans')
+def check_query_plans_command():
+    """Verify that the hot progress and history queries use their indexes."""
+    init_db()
+    conn = get_db_connection()
+    failed = 0
+    for name, index, plan, ok in check_query_plans(conn):
+        print(f"{'OK  ' if ok else 'FAIL'} {name}: {plan}")
+        if not ok:
+            failed += 1
+    conn.close()
+    if failed:
+        raise SystemExit(f"{failed} queries do not use their expected index")
+
+@app.cli.command('rebuild-rollups')
+def rebuild_rollups_command():
+    """Recompute the weekly progress rollup and streaks from the session history."""
+    init_db()
+    conn = get_db_connection()
+    sessions = rebuild_rollups(conn)
+    users = rebuild_streaks(conn)
+    conn.commit()
+    conn.close()
+    print(f"Rebuilt weekly progress from {sessions} sessions and streaks for {users} users")
+
 if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s %(name)s: %(message)s')
+
     # Initialize database and populate exercises
     init_db()
     populate_exercises_db()
@@ -0,0 +1,322 @@
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from workout_selector import select_greedy, select_knapsack
+
+CATEGORIES = ['Strength & Power', 'Speed & Mobility', 'Endurance', 'Agility', 'Cognition']
+DURATIONS = [0.3, 0.5, 0.7, 0.8, 1.0, 1.5, 2.0]
+
+
+def make_catalog(size, seed=42):
+    """Build a synthetic exercise catalog shaped like comprehensive_training_matrix.csv."""
+    rng = random.Random(seed)
+    return [{
+        'name': f"Exercise {i}",
+        'category': rng.choice(CATEGORIES),
+        'duration': rng.choice(DURATIONS) if i % 10 else round(rng.uniform(0.2, 5.0), 2),
+        'difficulty': rng.choice(['beginner', 'intermediate', 'advanced'])
+    } for i in range(size)]
+
+
+def bench_selection(sizes=(150, 10000, 50000), targets=(5, 15, 30, 45), repeat=20):
+    """Compare greedy and knapsack selection on latency and fit to the target duration."""
+    print(f"{'catalog':>8} {'target':>7} {'mode':>9} {'avg ms':>8} {'total':>7} {'error':>7} {'domains':>8}")
+    for size in sizes:
+        catalog = sorted(make_catalog(size), key=lambda ex: ex['duration'])
+        for target in targets:
+            for name, selector in (('greedy', select_greedy), ('knapsack', select_knapsack)):
+                start = time.perf_counter()
+                for _ in range(repeat):
+                    selected = selector(catalog, target, categories=CATEGORIES)
+                elapsed = (time.perf_counter() - start) / repeat * 1000
+                total = sum(ex['duration'] for ex in selected)
+                domains = len({ex['category'] for ex in selected})
+                print(f"{size:>8} {target:>7} {name:>9} {elapsed:>8.2f} {total:>7.1f} {abs(total - target):>7.1f} {domains:>8}")
+
+
+def _temp_app_db():
+    """Point the app at a fresh, fully migrated database in a temp directory."""
+    import app
+    app.DATABASE = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    app.init_db()
+    return app
+
+
+def _legacy_update_user_progress(conn, user_id, session_data):
+    # The SELECT-then-UPDATE/INSERT loop update_user_progress used before the upsert
+    for domain, progress_data in session_data.get('domainProgress', {}).items():
+        if progress_data.get('exercises', 0) > 0:
+            existing = conn.execute(
+                'SELECT id FROM user_progress WHERE user_id = ? AND domain = ?', (user_id, domain)
+            ).fetchone()
+            if existing:
+                conn.execute('''
+                    UPDATE user_progress
+                    SET sessions_completed = sessions_completed + ?,
+                        total_minutes = total_minutes + ?,
+                        last_session_date = CURRENT_DATE
+                    WHERE user_id = ? AND domain = ?
+                ''', (progress_data.get('exercises', 0), progress_data.get('minutes', 0), user_id, domain))
+            else:
+                conn.execute('''
+                    INSERT INTO user_progress (user_id, domain, sessions_completed, total_minutes, last_session_date)
+                    VALUES (?, ?, ?, ?, CURRENT_DATE)
+                ''', (user_id, domain, progress_data.get('exercises', 0), progress_data.get('minutes', 0)))
+
+
+def _completion_payload(rng):
+    domains = ['strength_power', 'speed_mobility', 'endurance', 'agility', 'cognition']
+    return {
+        'exercises': [{'name': f"Exercise {i}", 'duration': 0.5} for i in range(8)],
+        'totalDuration': rng.randint(5, 30),
+        'sessionType': 'custom',
+        'domainProgress': {d: {'exercises': rng.randint(1, 3), 'minutes': rng.randint(1, 6)} for d in domains}
+    }
+
+
+def bench_progress_writes(completions=2000, users=200):
+    """Session-completion write latency and write-lock hold time, before and after the upsert."""
+    app = _temp_app_db()
+    rng = random.Random(7)
+    payloads = [(rng.randint(1, users), _completion_payload(rng)) for _ in range(completions)]
+
+    def legacy(conn, user_id, data):
+        _legacy_update_user_progress(conn, user_id, data)
+
+    def upsert(conn, user_id, data):
+        app.update_user_progress(user_id, data, conn)
+
+    print(f"{'mode':>8} {'avg ms':>8} {'p95 ms':>8} {'lock avg ms':>12} {'lock p95 ms':>12}")
+    for name, update in (('legacy', legacy), ('upsert', upsert)):
+        conn = app.get_db_connection()
+        conn.execute('DELETE FROM user_progress')
+        conn.commit()
+        latencies, lock_times = [], []
+        for user_id, data in payloads:
+            start = time.perf_counter()
+            conn = app.get_db_connection()
+            # The write lock is held from the first write until commit returns
+            conn.execute('BEGIN IMMEDIATE')
+            locked = time.perf_counter()
+            conn.execute('''
+                INSERT INTO user_sessions (user_id, exercises_completed, total_duration, session_type)
+                VALUES (?, ?, ?, ?)
+            ''', (user_id, json.dumps(data['exercises']), data['totalDuration'], data['sessionType']))
+            update(conn, user_id, data)
+            conn.commit()
+            end = time.perf_counter()
+            conn.close()
+            latencies.append((end - start) * 1000)
+            lock_times.append((end - locked) * 1000)
+        p95 = lambda values: statistics.quantiles(values, n=20)[-1]
+        print(f"{name:>8} {statistics.mean(latencies):>8.3f} {p95(latencies):>8.3f} "
+              f"{statistics.mean(lock_times):>12.3f} {p95(lock_times):>12.3f}")
+
+
+def bench_session_writes(concurrency=(1, 8, 32), per_client=50):
+    """Throughput of concurrent /api/complete_session calls, synchronous vs write-behind."""
+    app = _temp_app_db()
+    rng = random.Random(11)
+    print(f"{'mode':>12} {'clients':>8} {'sessions':>9} {'ack p95 ms':>11} {'durable/s':>10}")
+    for mode in ('sync', 'write-behind'):
+        app.SESSION_WRITE_BEHIND = mode == 'write-behind'
+        for clients in concurrency:
+            payloads = [_completion_payload(rng) for _ in range(per_client)]
+            latencies = []
+            lock = threading.Lock()
+
+            def run(user_id):
+                client = app.app.test_client()
+                with client.session_transaction() as sess:
+                    sess['user_id'] = user_id
+                for data in payloads:
+                    start = time.perf_counter()
+                    response = client.post('/api/complete_session', json=data)
+                    elapsed = (time.perf_counter() - start) * 1000
+                    assert response.status_code in (200, 202), response.get_json()
+                    with lock:
+                        latencies.append(elapsed)
+
+            threads = [threading.Thread(target=run, args=(user_id,)) for user_id in range(1, clients + 1)]
+            start = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            # Throughput only counts sessions that are committed
+            app.session_writes.flush()
+            elapsed = time.perf_counter() - start
+            sessions = clients * per_client
+            p95 = statistics.quantiles(latencies, n=20)[-1]
+            print(f"{mode:>12} {clients:>8} {sessions:>9} {p95:>11.2f} {sessions / elapsed:>10.0f}")
+    print(f"write-behind batches: {app.session_writes.stats()}")
+
+
+def _exercise_rows(size, seed=42):
+    return [dict(ex, description=f"About {ex['name']}", target_muscles='Legs', instructions='Move.')
+            for ex in make_catalog(size, seed)]
+
+
+def _legacy_populate(conn, rows):
+    # The row-at-a-time insert populate_exercises_db used on an empty table
+    for exercise in rows:
+        conn.execute('''
+            INSERT INTO exercises (category, exercise_name, duration_minutes,
+                                 primary_benefit, secondary_benefit, difficulty_level)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (exercise['category'], exercise['name'], exercise['duration'],
+              exercise['description'], exercise['target_muscles'], exercise['difficulty']))
+    conn.commit()
+
+
+def bench_exercise_sync(sizes=(1000, 100000)):
+    """Exercise table sync: fresh import, no-op resync and a 1% change set."""
+    from exercise_sync import sync_exercises
+    print(f"{'rows':>8} {'step':>16} {'ms':>9}  counts")
+    for size in sizes:
+        app = _temp_app_db()
+        rows = _exercise_rows(size)
+        conn = app.get_db_connection()
+
+        start = time.perf_counter()
+        _legacy_populate(conn, rows)
+        print(f"{size:>8} {'legacy populate':>16} {(time.perf_counter() - start) * 1000:>9.1f}")
+        conn.execute('DELETE FROM exercises')
+        conn.commit()
+
+        changed = [dict(row, duration=row['duration'] + 1) if i % 200 == 0 else row
+                   for i, row in enumerate(rows) if i % 200 != 1]
+        for step, data in (('fresh import', rows), ('no-op resync', rows), ('1% changed', changed)):
+            start = time.perf_counter()
+            counts = sync_exercises(conn, data)
+            print(f"{size:>8} {step:>16} {(time.perf_counter() - start) * 1000:>9.1f}  {counts}")
+        conn.close()
+
+
+def bench_search(size=100000, repeat=20):
+    """Full-text exercise search on a large catalog, by how many rows a query matches."""
+    from exercise_search import rank_ids, search_exercises
+    from exercise_sync import sync_exercises
+    rng = random.Random(7)
+    # Zipf-like vocabulary, so queries range from rare to near-universal terms
+    vocab = [f"term{i}" for i in range(3000)]
+    weights = [1 / (i + 1) for i in range(len(vocab))]
+
+    def text(k):
+        return ' '.join(rng.choices(vocab, weights, k=k))
+
+    app = _temp_app_db()
+    rows = [dict(ex, name=f"{text(2)} {ex['name']}", description=text(10), target_muscles='Legs',
+                 instructions=text(25)) for ex in make_catalog(size)]
+    conn = app.get_db_connection()
+    start = time.perf_counter()
+    sync_exercises(conn, rows)
+    print(f"indexed {size} exercises in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    print(f"{'query':>24} {'matches':>8} {'ms':>8}")
+    for query in ('term2000', 'term500', 'term50', 'term5', 'term50 term500', 'term2'):
+        matches = conn.execute('SELECT COUNT(*) FROM exercises_fts WHERE exercises_fts MATCH ?', (query,)).fetchone()[0]
+        start = time.perf_counter()
+        for _ in range(repeat):
+            search_exercises(conn, query, 20)
+        print(f"{query:>24} {matches:>8} {(time.perf_counter() - start) / repeat * 1000:>8.2f}")
+    start = time.perf_counter()
+    for _ in range(repeat):
+        rank_ids(conn, 'term300 term900 with term1500', categories=CATEGORIES[:2])
+    print(f"{'prerank (3 terms)':>24} {'':>8} {(time.perf_counter() - start) / repeat * 1000:>8.2f}")
+    conn.close()
+
+
+def bench_serialization(sizes=(150, 10000), repeat=50):
+    """Encoding the exercise listing: stdlib jsonify, orjson, and a cached body."""
+    from flask import Flask
+    from flask.json.provider import DefaultJSONProvider
+    from serialization import BACKEND, FastJSONProvider, PayloadCache
+    app = Flask(__name__)
+    stdlib, fast = DefaultJSONProvider(app), FastJSONProvider(app)
+    app.json = fast
+    cache = PayloadCache()
+    print(f"fast backend: {BACKEND}")
+    print(f"{'exercises':>10} {'stdlib ms':>10} {'fast ms':>10} {'cached ms':>10}")
+    for size in sizes:
+        payload = {'exercises': [dict(ex, id=i, description='About it', target_muscles='Legs', instructions='Move.')
+                                 for i, ex in enumerate(make_catalog(size))]}
+        timings = []
+        with app.app_context():
+            for respond in (stdlib.response, fast.response,
+                            lambda obj: cache.get_or_encode(('exercises', size), lambda: obj)):
+                start = time.perf_counter()
+                for _ in range(repeat):
+                    respond(payload)
+                timings.append((time.perf_counter() - start) / repeat * 1000)
+        print(f"{size:>10} {timings[0]:>10.3f} {timings[1]:>10.3f} {timings[2]:>10.3f}")
+
+
+STARTUP_SCRIPTS = {
+    # pandas is only imported inside the child process, and only for this comparison
+    'pandas': """
+import time
+start = time.perf_counter()
+import pandas as pd
+for path in FILES:
+    pd.read_csv(path).to_dict('records')
+print(time.perf_counter() - start)
+""",
+    'csv_loader': """
+import time
+start = time.perf_counter()
+from csv_loader import read_csv
+for path in FILES:
+    read_csv(path)
+print(time.perf_counter() - start)
+""",
+    'import app': """
+import time
+start = time.perf_counter()
+import app
+print(time.perf_counter() - start)
+"""
+}
+
+
+def bench_startup(repeat=5):
+    """Cold-start cost of loading the CSV data with pandas vs csv_loader, in fresh interpreters."""
+    files = sorted(os.path.join('data', name) for name in os.listdir('data') if name.endswith('.csv'))
+    print(f"{'loader':>12} {'min ms':>8} {'avg ms':>8}")
+    for name, script in STARTUP_SCRIPTS.items():
+        timings = []
+        for _ in range(repeat):
+            result = subprocess.run(
+                [sys.executable, '-c', f"FILES = {files!r}\n{script}"],
+                capture_output=True, text=True
+            )
+            if result.returncode != 0:
+                print(f"{name:>12} skipped: {result.stderr.strip().splitlines()[-1]}")
+                break
+            timings.append(float(result.stdout.strip().splitlines()[-1]) * 1000)
+        else:
+            print(f"{name:>12} {min(timings):>8.1f} {statistics.mean(timings):>8.1f}")
+
+
+BENCHMARKS = {
+    'selection': bench_selection,
+    'progress_writes': bench_progress_writes,
+    'session_writes': bench_session_writes,
+    'startup': bench_startup,
+    'exercise_sync': bench_exercise_sync,
+    'search': bench_search,
+    'serialization': bench_serialization
+}
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        print(f"== {name} ==")
+        BENCHMARKS[name]()
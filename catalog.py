@@ -0,0 +1,178 @@
+import hashlib
+import heapq
+import json
+import threading
+from collections import namedtuple
+
+# An immutable view of the exercise table at a given catalog version.
+# Exercise dicts are shared between requests and must be treated as read-only.
+CatalogSnapshot = namedtuple('CatalogSnapshot', ['version', 'exercises', 'index'])
+
+
+def _duration(exercise):
+    return exercise['duration']
+
+
+def normalize_difficulty(value):
+    """Normalize a difficulty label for index lookups."""
+    return str(value or '').strip().lower()
+
+
+def _index_keys(exercise):
+    # Every exercise lives in its (category, difficulty) bucket and in the
+    # (category, None) bucket that spans all difficulties
+    category = exercise['category']
+    return ((category, normalize_difficulty(exercise['difficulty'])), (category, None))
+
+
+def build_category_index(exercises):
+    """Group exercises by (category, difficulty), each bucket sorted by duration."""
+    buckets = {}
+    for exercise in exercises:
+        for key in _index_keys(exercise):
+            buckets.setdefault(key, []).append(exercise)
+    return {key: tuple(sorted(bucket, key=_duration)) for key, bucket in buckets.items()}
+
+
+def lookup_exercises(index, categories, difficulty=None):
+    """Merge the buckets for the given categories into one duration-sorted list.
+
+    With a difficulty only that level is returned; without one every level is.
+    """
+    level = normalize_difficulty(difficulty) or None
+    buckets = [index.get((category, level), ()) for category in dict.fromkeys(categories)]
+    return list(heapq.merge(*buckets, key=_duration))
+
+
+class ExerciseCatalog:
+    """Process-wide cache of the exercises table with versioned snapshots.
+
+    ``source_version`` returns the version the database records for the
+    table. When given, every read compares it with the version the snapshot
+    was loaded at and reloads on a mismatch, so changes made by another
+    process (e.g. a second gunicorn worker) show up on the next request.
+    """
+
+    def __init__(self, loader, source_version=None):
+        self._loader = loader
+        self._source_version = source_version
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._loaded_at = None
+        self._version = 0
+        self._fingerprint = (None, None)
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+
+    def _current_source(self):
+        return self._source_version() if self._source_version is not None else None
+
+    def _load(self):
+        # Read the version first: rows committed in between only cause one extra reload
+        source = self._current_source()
+        exercises = tuple(self._loader())
+        return source, exercises
+
+    def snapshot(self):
+        """Return the current snapshot, loading the table on first use."""
+        snap = self._snapshot
+        if snap is not None:
+            if self._current_source() == self._loaded_at:
+                self.hits += 1
+                return snap
+            # Changed elsewhere: one thread reloads, the others keep the old snapshot meanwhile
+            if not self._lock.acquire(blocking=False):
+                self.hits += 1
+                return snap
+            try:
+                self.reloads += 1
+                return self._swap(*self._load())
+            finally:
+                self._lock.release()
+
+        with self._lock:
+            # Another thread may have loaded it while we waited for the lock
+            if self._snapshot is not None:
+                self.hits += 1
+                return self._snapshot
+            self.misses += 1
+            return self._swap(*self._load())
+
+    def _swap(self, source, exercises):
+        # Caller holds the lock
+        self._version += 1
+        self._loaded_at = source
+        self._snapshot = CatalogSnapshot(self._version, exercises, build_category_index(exercises))
+        return self._snapshot
+
+    @property
+    def version(self):
+        """Version of the current snapshot (0 if nothing is loaded yet)."""
+        snap = self._snapshot
+        return snap.version if snap is not None else self._version
+
+    def fingerprint(self, snapshot=None):
+        """Content hash of a snapshot, stable across restarts and processes.
+
+        Computed once per catalog version.
+        """
+        snap = snapshot or self.snapshot()
+        version, digest = self._fingerprint
+        if version != snap.version:
+            payload = json.dumps(snap.exercises, sort_keys=True, separators=(',', ':'))
+            digest = hashlib.sha1(payload.encode('utf-8')).hexdigest()
+            self._fingerprint = (snap.version, digest)
+        return digest
+
+    def add(self, exercise, source_version=None):
+        """Patch a newly inserted exercise into the cached snapshot.
+
+        ``source_version`` is the database version the insert produced. If
+        other changes happened since the snapshot was loaded, the next read
+        reloads the table instead.
+        """
+        with self._lock:
+            if self._snapshot is None:
+                # Nothing cached yet; the next read picks the row up from the DB
+                return
+            index = dict(self._snapshot.index)
+            for key in _index_keys(exercise):
+                index[key] = tuple(sorted(index.get(key, ()) + (exercise,), key=_duration))
+            self._version += 1
+            self._snapshot = CatalogSnapshot(self._version, self._snapshot.exercises + (exercise,), index)
+            if source_version is not None and self._loaded_at is not None and source_version == self._loaded_at + 1:
+                self._loaded_at = source_version
+
+    def refresh(self):
+        """Reload the table and swap the new snapshot in.
+
+        Unlike invalidate(), readers never wait: they keep getting the old
+        snapshot until the new one is ready.
+        """
+        source, exercises = self._load()
+        index = build_category_index(exercises)
+        with self._lock:
+            self._version += 1
+            self._loaded_at = source
+            self._snapshot = CatalogSnapshot(self._version, exercises, index)
+            return self._snapshot
+
+    def invalidate(self):
+        """Drop the cached snapshot so the next read reloads the table."""
+        with self._lock:
+            self._snapshot = None
+            self._version += 1
+
+    def stats(self):
+        """Cache counters for the debug endpoint."""
+        snap = self._snapshot
+        return {
+            'version': self.version,
+            'source_version': self._loaded_at,
+            'loaded': snap is not None,
+            'size': len(snap.exercises) if snap is not None else 0,
+            'hits': self.hits,
+            'misses': self.misses,
+            'reloads': self.reloads
+        }
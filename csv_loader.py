@@ -0,0 +1,62 @@
+"""Small stdlib replacement for the ``pandas.read_csv(...).to_dict('records')`` calls.
+
+Cells pandas treats as missing by default become None (pandas gave NaN),
+and each column is converted to int or float when every present value
+parses as one, like pandas' type inference.
+"""
+
+import csv
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# pandas' default na_values
+NA_VALUES = frozenset([
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null'
+])
+
+
+def _column_type(values):
+    present = [v for v in values if v is not None]
+    if not present:
+        return None
+    for kind in (int, float):
+        try:
+            for value in present:
+                kind(value)
+        except ValueError:
+            continue
+        return kind
+    return None
+
+
+def read_csv(path, na_values=NA_VALUES):
+    """Read a CSV file into a list of row dicts with missing cells as None.
+
+    Numeric columns come back as int (or float if any value needs it). Unlike
+    pandas, an int column with missing cells stays int rather than turning
+    into float.
+    """
+    logger.info('Loading %s...', os.path.basename(path))
+    with open(path, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return []
+        columns = [[] for _ in header]
+        for row in reader:
+            if not row:
+                continue
+            for i in range(len(header)):
+                value = row[i] if i < len(row) else ''
+                columns[i].append(None if value in na_values else value)
+
+    for i, values in enumerate(columns):
+        kind = _column_type(values)
+        if kind is not None:
+            columns[i] = [None if v is None else kind(v) for v in values]
+    rows = [dict(zip(header, row)) for row in zip(*columns)]
+    logger.info('Loaded %d rows from %s', len(rows), os.path.basename(path))
+    return rows
@@ -0,0 +1,215 @@
+"""Everything a user's dashboard shows, loaded together.
+
+``load_dashboard`` reads a logged-in user's progress, stats and recent
+sessions over one connection in three indexed queries; ``guest_dashboard``
+builds the same result from the Flask session. The index, progress and
+stats views all render from the resulting ``Dashboard``.
+
+Every write that changes what a user's dashboard shows bumps the user's row
+in ``user_data_versions``, in the writing transaction, so any process can
+tell whether its cached dashboard is still current.
+"""
+
+import threading
+import time
+from collections import namedtuple
+from datetime import date
+
+from program_index import DEFAULT_PROGRAM_ID
+from progress_rollup import CHART_WEEKS, read_progress, week_labels
+from streaks import live_streak, local_day
+
+DOMAINS = ['strength_power', 'speed_mobility', 'endurance', 'agility', 'cognition']
+
+# progress: the progress page / /api/user_progress payload
+# stats: the /api/user_stats payload
+# current_week, program_ids, today: what picks today's program session
+Dashboard = namedtuple('Dashboard', ['progress', 'stats', 'current_week', 'program_ids', 'today'])
+
+
+CREATE_VERSION_TABLE = '''
+    CREATE TABLE IF NOT EXISTS user_data_versions (
+        user_id INTEGER PRIMARY KEY,
+        version INTEGER NOT NULL
+    )
+'''
+
+
+def bump_user_version(conn, user_id):
+    """Mark a user's dashboard data as changed; call inside the writing transaction."""
+    conn.execute('''
+        INSERT INTO user_data_versions (user_id, version) VALUES (?, 1)
+        ON CONFLICT (user_id) DO UPDATE SET version = version + 1
+    ''', (user_id,))
+
+
+def user_version(conn, user_id):
+    """Current version of a user's dashboard data (0 if it never changed)."""
+    row = conn.execute('SELECT version FROM user_data_versions WHERE user_id = ?', (user_id,)).fetchone()
+    return row[0] if row is not None else 0
+
+
+def _progress_payload(domains, total_sessions, total_minutes, streak, avg_length, weekly_progress, recent_sessions,
+                      today):
+    # weekly_progress is oldest first, ending with the current week
+    return {
+        'total_sessions': total_sessions,
+        'total_minutes': total_minutes,
+        'current_streak': streak,
+        'avg_session_length': avg_length,
+        'weekly_progress': weekly_progress,
+        'weekly_labels': week_labels(today, len(weekly_progress)),
+        'recent_sessions': recent_sessions,
+        'strength': domains['strength_power'],
+        'speed_mobility': domains['speed_mobility'],
+        'endurance': domains['endurance'],
+        'agility': domains['agility'],
+        'cognitive': domains['cognition']
+    }
+
+
+def load_dashboard(conn, user_id, now=None):
+    """Load a logged-in user's dashboard."""
+    summary = conn.execute('''
+        SELECT
+            (SELECT current_week FROM user_progress WHERE user_id = ? LIMIT 1) AS current_week,
+            (SELECT COUNT(*) FROM user_sessions WHERE user_id = ?) AS session_count,
+            (SELECT group_concat(program_id) FROM
+                (SELECT program_id FROM user_programs WHERE user_id = ? ORDER BY position)) AS program_ids,
+            s.current_streak, s.last_active_day, s.timezone
+        FROM (SELECT 1) LEFT JOIN user_streaks s ON s.user_id = ?
+    ''', (user_id, user_id, user_id, user_id)).fetchone()
+
+    # "Today" is the user's own day, as for streaks
+    today = local_day(summary['timezone'], now)
+    streak = 0
+    if summary['last_active_day']:
+        streak = live_streak(summary['current_streak'], date.fromisoformat(str(summary['last_active_day'])[:10]), today)
+
+    domain_totals, weekly_minutes = read_progress(conn, user_id, today)
+
+    recent_sessions = conn.execute('''
+        SELECT session_date, total_duration, session_type
+        FROM user_sessions
+        WHERE user_id = ?
+        ORDER BY session_date DESC
+        LIMIT 10
+    ''', (user_id,)).fetchall()
+
+    domains = {}
+    for domain in DOMAINS:
+        totals = domain_totals.get(domain)
+        if totals is None:
+            domains[domain] = {'sessions': 0, 'minutes': 0, 'week': 1, 'progress': 0}
+        else:
+            domains[domain] = {
+                'sessions': totals['exercises'],  # Same count user_progress.sessions_completed keeps
+                'minutes': totals['minutes'],
+                'week': 1,  # Default week
+                'progress': min(totals['minutes'], 100)  # Progress based on minutes
+            }
+    total_sessions = sum(d['sessions'] for d in domains.values())
+    total_minutes = sum(d['minutes'] for d in domains.values())
+    avg_length = round(total_minutes / total_sessions) if total_sessions > 0 else 0
+
+    progress = _progress_payload(domains, total_sessions, total_minutes, streak, avg_length,
+                                 weekly_minutes, [dict(s) for s in recent_sessions], today)
+
+    current_week = summary['current_week'] or 1
+    has_progress = summary['current_week'] is not None
+    stats = {
+        'current_week': current_week,
+        'streak': streak if has_progress else 0,
+        'weekly_minutes': weekly_minutes[-1] if has_progress else 0,
+        'total_sessions': summary['session_count'] if has_progress else 0,
+        'domain_progress': {domain: totals['exercises'] for domain, totals in domain_totals.items()}
+    }
+    programs = summary['program_ids'].split(',') if summary['program_ids'] else [DEFAULT_PROGRAM_ID]
+    return Dashboard(progress, stats, current_week, programs, today)
+
+
+def guest_dashboard(state, now=None):
+    """Build a guest's dashboard from their Flask session data."""
+    domain_progress = state.get('domain_progress', {})
+    weekly_minutes = state.get('weekly_minutes', 0)
+    last_day = state.get('last_session_day')
+    today = local_day(state.get('timezone'), now)
+    streak = 0
+    if last_day:
+        streak = live_streak(state.get('streak', 0), date.fromisoformat(last_day), today)
+
+    # Guests only track exercise counts, so minutes are estimated
+    domains = {}
+    for domain in DOMAINS:
+        count = domain_progress.get(domain, 0)
+        domains[domain] = {'sessions': count, 'minutes': count * 10, 'week': 1, 'progress': min(count * 10, 100)}
+    total = sum(domain_progress.values())
+
+    progress = _progress_payload(domains, total, weekly_minutes, streak, 15 if total > 0 else 0,
+                                 [0] * (CHART_WEEKS - 1) + [weekly_minutes], state.get('recent_sessions', []), today)
+    current_week = state.get('current_week', 1)
+    stats = {
+        'current_week': current_week,
+        'streak': streak,
+        'weekly_minutes': weekly_minutes,
+        'total_sessions': 0,
+        'domain_progress': domain_progress
+    }
+    return Dashboard(progress, stats, current_week, state.get('program_ids') or [DEFAULT_PROGRAM_ID], today)
+
+
+class DashboardCache:
+    """Short-lived per-user cache of Dashboard results.
+
+    Entries are kept with the user's data version and only served while the
+    version read by the caller still matches, which catches writes made by
+    other processes. ``invalidate`` is called after a user's session is
+    committed in this process; a load that started before the invalidation
+    is not cached, so it can't resurrect stale data.
+    """
+
+    def __init__(self, ttl=30, max_size=1000):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = {}
+        self._generations = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_load(self, user_id, loader, version=None):
+        """Return the cached dashboard for ``user_id`` at ``version``, calling ``loader()`` on a miss."""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] > time.monotonic() and entry[1] == version:
+                self.hits += 1
+                return entry[2]
+            self.misses += 1
+            generation = self._generations.get(user_id, 0)
+
+        dashboard = loader()
+        if self.ttl > 0:
+            with self._lock:
+                if self._generations.get(user_id, 0) == generation:
+                    if len(self._entries) >= self.max_size:
+                        self._prune()
+                    self._entries[user_id] = (time.monotonic() + self.ttl, version, dashboard)
+        return dashboard
+
+    def invalidate(self, user_id):
+        """Drop a user's cached dashboard after their data changed."""
+        with self._lock:
+            self._entries.pop(user_id, None)
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+
+    def stats(self):
+        """Cache counters for the debug endpoint."""
+        return {'size': len(self._entries), 'ttl': self.ttl, 'hits': self.hits, 'misses': self.misses}
+
+    def _prune(self):
+        # Drop expired entries; if still full, drop the ones expiring soonest
+        now = time.monotonic()
+        for user_id in [u for u, (expires, _, _) in self._entries.items() if expires <= now]:
+            del self._entries[user_id]
+        while len(self._entries) >= self.max_size:
+            del self._entries[min(self._entries, key=lambda u: self._entries[u][0])]
@@ -0,0 +1,106 @@
+import threading
+import time
+import traceback
+
+
+class DataRegistry:
+    """Named datasets that are loaded on first use and then memoized.
+
+    Each dataset is registered with a loader and a fallback value. A loader
+    that raises is logged, its error is recorded in ``stats()``, and the
+    fallback is served until the dataset is invalidated. Datasets derived
+    from others list them in ``depends_on`` and are invalidated with them.
+    """
+
+    def __init__(self):
+        self._loaders = {}
+        self._values = {}
+        self._info = {}
+        self._locks = {}
+        self._dependents = {}
+        # Bumped whenever any dataset is replaced, for caches derived from them
+        self.version = 0
+
+    def register(self, name, loader, default=None, depends_on=()):
+        """Add a dataset; nothing is loaded until it is first requested."""
+        self._loaders[name] = (loader, default)
+        self._locks[name] = threading.Lock()
+        self._info[name] = {'loaded': False, 'loads': 0, 'load_ms': None, 'loaded_at': None, 'error': None}
+        for parent in depends_on:
+            self._dependents.setdefault(parent, []).append(name)
+
+    def get(self, name):
+        """Return the dataset, loading it if this is the first access."""
+        try:
+            return self._values[name]
+        except KeyError:
+            pass
+        with self._locks[name]:
+            if name not in self._values:
+                self._values[name] = self._load(name)
+            return self._values[name]
+
+    def preload(self, names=None, strict=False):
+        """Load datasets up front, e.g. in the gunicorn master before forking.
+
+        With ``strict`` a dataset that failed to load raises RuntimeError
+        instead of leaving the process to serve the fallback.
+        """
+        for name in names or list(self._loaders):
+            self.get(name)
+        failed = {name: info['error'] for name, info in self._info.items() if info['error']}
+        if strict and failed:
+            raise RuntimeError(f"Failed to load datasets: {failed}")
+        return self.stats()
+
+    def refresh(self, name):
+        """Reload a dataset now and swap it in; returns False if the loader failed.
+
+        Readers keep getting the old value until the new one is ready, and a
+        failed reload keeps serving the old value. Derived datasets are
+        rebuilt the same way once the new value is in place.
+        """
+        try:
+            value = self._load(name, fallback=False)
+        except Exception:
+            return False
+        with self._locks[name]:
+            self._values[name] = value
+        self.version += 1
+        for dependent in self._dependents.get(name, []):
+            if not self.refresh(dependent):
+                self.invalidate(dependent)
+        return True
+
+    def invalidate(self, name):
+        """Drop a dataset (and everything derived from it) so the next access reloads it."""
+        with self._locks[name]:
+            self._values.pop(name, None)
+            self._info[name]['loaded'] = False
+        self.version += 1
+        for dependent in self._dependents.get(name, []):
+            self.invalidate(dependent)
+
+    def stats(self):
+        """Per-dataset load state and timings for the debug endpoint."""
+        return {name: dict(info) for name, info in self._info.items()}
+
+    def _load(self, name, fallback=True):
+        loader, default = self._loaders[name]
+        info = self._info[name]
+        start = time.perf_counter()
+        try:
+            value = loader()
+            info['error'] = None
+        except Exception as e:
+            print(f"[ERROR] Loading {name} failed: {e}")
+            traceback.print_exc()
+            info['error'] = str(e)
+            if not fallback:
+                raise
+            value = default() if callable(default) else default
+        info['loaded'] = True
+        info['loads'] += 1
+        info['load_ms'] = round((time.perf_counter() - start) * 1000, 2)
+        info['loaded_at'] = time.time()
+        return value
@@ -0,0 +1,116 @@
+import hashlib
+import os
+import threading
+import time
+import traceback
+
+
+def file_signature(path):
+    """(mtime_ns, size) of a file, or None if it is missing."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def file_digest(path):
+    """SHA-256 of a file's contents."""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(65536), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+class DataWatcher:
+    """Polls data files and reports the ones whose contents changed.
+
+    A file is only hashed when its mtime or size moved, and only reported
+    when the hash differs too, so touching a file or rewriting identical
+    contents does not trigger a reload. ``on_change(name)`` runs on the
+    watcher thread; request threads keep using the data they already hold.
+    """
+
+    def __init__(self, files, on_change, interval=2.0):
+        self.files = dict(files)
+        self.on_change = on_change
+        self.interval = interval
+        self._seen = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self.checks = 0
+        self.reloads = 0
+        self.errors = 0
+        self.last_reload = None
+
+    def record(self, name):
+        """Remember the current state of a file; call just before parsing it."""
+        path = self.files[name]
+        signature = file_signature(path)
+        digest = file_digest(path) if signature else None
+        with self._lock:
+            self._seen[name] = (signature, digest)
+
+    def check(self):
+        """Compare every file with its recorded state; returns the names that changed."""
+        changed = []
+        for name, path in self.files.items():
+            signature = file_signature(path)
+            with self._lock:
+                seen = self._seen.get(name)
+            if seen is None or signature is None or signature == seen[0]:
+                continue
+            try:
+                digest = file_digest(path)
+            except OSError:
+                continue
+            with self._lock:
+                self._seen[name] = (signature, digest)
+            if digest != seen[1]:
+                changed.append(name)
+
+        self.checks += 1
+        for name in changed:
+            try:
+                self.on_change(name)
+                self.reloads += 1
+                self.last_reload = time.time()
+            except Exception as e:
+                self.errors += 1
+                print(f"[ERROR] Reloading {name} failed: {e}")
+                traceback.print_exc()
+        return changed
+
+    def start(self):
+        """Start polling in a daemon thread (again after a fork); no-op if disabled or running."""
+        if self.interval <= 0 or (self._thread is not None and self._pid == os.getpid()):
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name='data-watcher', daemon=True)
+                self._thread.start()
+
+    def stats(self):
+        """Watcher counters for the debug endpoint."""
+        with self._lock:
+            files = {name: (seen[1] or '')[:12] for name, seen in self._seen.items()}
+        return {
+            'interval': self.interval,
+            'running': self._thread is not None and self._pid == os.getpid(),
+            'files': files,
+            'checks': self.checks,
+            'reloads': self.reloads,
+            'errors': self.errors,
+            'last_reload': self.last_reload
+        }
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.check()
+            except Exception:
+                traceback.print_exc()
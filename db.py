@@ -0,0 +1,114 @@
+import os
+import sqlite3
+import threading
+import weakref
+
+# Applied to every new connection. WAL lets readers proceed while a writer
+# commits; synchronous=NORMAL is durable enough in WAL mode and avoids an
+# fsync per transaction.
+DEFAULT_PRAGMAS = (
+    ('journal_mode', 'WAL'),
+    ('synchronous', 'NORMAL'),
+    ('cache_size', int(os.environ.get('SQLITE_CACHE_KB', 20000)) * -1),
+    ('mmap_size', int(os.environ.get('SQLITE_MMAP_BYTES', 256 * 1024 * 1024))),
+    ('temp_store', 'MEMORY'),
+    ('busy_timeout', 5000)
+)
+
+
+class ManagedConnection(sqlite3.Connection):
+    """A connection owned by a ConnectionManager.
+
+    ``close()`` hands the connection back instead of closing it: once the
+    last caller in the thread is done, any uncommitted work is rolled back,
+    exactly as a real close would have discarded it.
+    """
+
+    manager = None
+    checkouts = 0
+
+    def close(self):
+        self.manager.release(self)
+
+    def really_close(self):
+        super().close()
+
+
+class ConnectionManager:
+    """Per-thread SQLite connections that are reused across requests."""
+
+    def __init__(self, pragmas=DEFAULT_PRAGMAS):
+        self.pragmas = pragmas
+        self._local = threading.local()
+        self._all = weakref.WeakSet()
+        self._lock = threading.Lock()
+        self.opened = 0
+        # Connections must never be shared with a forked child process
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._forget_all)
+
+    def get(self, path):
+        """Return this thread's connection to ``path``, opening it on first use."""
+        connections = self._connections()
+        conn = connections.get(path)
+        if conn is None:
+            conn = self._open(path)
+            connections[path] = conn
+        conn.checkouts += 1
+        return conn
+
+    def release(self, conn):
+        """Give a connection back; roll back leftover work when nobody holds it."""
+        conn.checkouts = max(0, conn.checkouts - 1)
+        if conn.checkouts == 0 and conn.in_transaction:
+            conn.rollback()
+
+    def release_thread(self):
+        """End-of-request cleanup: reset every connection held by this thread."""
+        for conn in self._connections().values():
+            conn.checkouts = 0
+            if conn.in_transaction:
+                conn.rollback()
+
+    def close_all(self):
+        """Close every connection opened by this manager (e.g. at shutdown)."""
+        with self._lock:
+            connections = list(self._all)
+            self._all = weakref.WeakSet()
+        for conn in connections:
+            try:
+                conn.really_close()
+            except sqlite3.ProgrammingError:
+                # Connections belonging to other threads can only be closed by them
+                pass
+        self._local = threading.local()
+
+    def stats(self):
+        """Connection counters for the debug endpoint."""
+        return {'open_connections': len(self._all), 'connections_opened': self.opened}
+
+    def _connections(self):
+        connections = getattr(self._local, 'connections', None)
+        if connections is None:
+            connections = self._local.connections = {}
+        return connections
+
+    def _open(self, path):
+        conn = sqlite3.connect(path, timeout=5, factory=ManagedConnection)
+        conn.manager = self
+        conn.row_factory = sqlite3.Row
+        for name, value in self.pragmas:
+            conn.execute(f"PRAGMA {name} = {value}")
+        with self._lock:
+            self._all.add(conn)
+            self.opened += 1
+        return conn
+
+    def _forget_all(self):
+        # Keep the parent's connections referenced but unused: letting them be
+        # garbage collected would close them (and possibly checkpoint the WAL)
+        # from the child process
+        self._inherited = list(self._all)
+        self._local = threading.local()
+        self._all = weakref.WeakSet()
+        self._lock = threading.Lock()
@@ -0,0 +1,117 @@
+"""Filtering, paging and field projection for the /api/exercises listing.
+
+Listings are computed from a catalog snapshot, so their ETag only depends
+on the catalog's content fingerprint and the normalized query.
+"""
+
+import hashlib
+import math
+from collections import namedtuple
+
+from catalog import lookup_exercises, normalize_difficulty
+
+FIELDS = ('id', 'category', 'name', 'duration', 'description', 'target_muscles', 'difficulty', 'instructions')
+SEARCH_FIELDS = ('name', 'description', 'instructions', 'target_muscles')
+DEFAULT_PER_PAGE = 50
+MAX_PER_PAGE = 200
+
+# Normalized listing parameters; page is None when the whole result is wanted
+ListingQuery = namedtuple('ListingQuery', [
+    'categories', 'difficulty', 'min_duration', 'max_duration', 'q', 'fields', 'page', 'per_page'
+])
+
+
+def _number(args, name, kind, minimum=None):
+    value = args.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        value = kind(value)
+    except ValueError:
+        raise ValueError(f"{name} must be a number")
+    if minimum is not None and value < minimum:
+        raise ValueError(f"{name} must be at least {minimum}")
+    return value
+
+
+def parse_listing_args(args):
+    """Build a ListingQuery from request args; raises ValueError on bad input.
+
+    ``category`` may be repeated or comma separated. Without ``page`` or
+    ``per_page`` every match is returned, as before pagination existed.
+    """
+    categories = []
+    for value in args.getlist('category'):
+        categories.extend(c.strip() for c in value.split(',') if c.strip())
+
+    fields = None
+    if args.get('fields'):
+        requested = [f.strip() for f in args['fields'].split(',') if f.strip()]
+        unknown = [f for f in requested if f not in FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+        # Keep the canonical order so equivalent queries share an ETag
+        fields = tuple(f for f in FIELDS if f in requested)
+
+    page = _number(args, 'page', int, minimum=1)
+    per_page = _number(args, 'per_page', int, minimum=1)
+    if page is not None or per_page is not None:
+        page = page or 1
+        per_page = min(per_page or DEFAULT_PER_PAGE, MAX_PER_PAGE)
+
+    return ListingQuery(
+        categories=tuple(sorted(set(categories))),
+        difficulty=normalize_difficulty(args.get('difficulty')) or None,
+        min_duration=_number(args, 'min_duration', float, minimum=0),
+        max_duration=_number(args, 'max_duration', float, minimum=0),
+        q=(args.get('q') or '').strip().lower() or None,
+        fields=fields,
+        page=page,
+        per_page=per_page
+    )
+
+
+def listing_etag(fingerprint, query):
+    """Strong ETag for a listing: the catalog content plus the normalized query."""
+    digest = hashlib.sha1(f"{fingerprint}|{tuple(query)!r}".encode('utf-8')).hexdigest()
+    return digest[:32]
+
+
+def _matches(exercise, query):
+    if query.difficulty and normalize_difficulty(exercise['difficulty']) != query.difficulty:
+        return False
+    if query.min_duration is not None and exercise['duration'] < query.min_duration:
+        return False
+    if query.max_duration is not None and exercise['duration'] > query.max_duration:
+        return False
+    if query.q:
+        haystack = ' '.join(str(exercise[f] or '') for f in SEARCH_FIELDS).lower()
+        if query.q not in haystack:
+            return False
+    return True
+
+
+def filter_exercises(snapshot, query):
+    """Exercises matching the query, in catalog (id) order."""
+    if query.categories:
+        # The index narrows the scan to the requested categories and level
+        pool = lookup_exercises(snapshot.index, query.categories, query.difficulty)
+        pool.sort(key=lambda exercise: exercise['id'])
+    else:
+        pool = snapshot.exercises
+    return [exercise for exercise in pool if _matches(exercise, query)]
+
+
+def build_listing(snapshot, query):
+    """The /api/exercises response body for a query."""
+    matches = filter_exercises(snapshot, query)
+    total = len(matches)
+    listing = {'total': total}
+    if query.page is not None:
+        start = (query.page - 1) * query.per_page
+        matches = matches[start:start + query.per_page]
+        listing.update(page=query.page, per_page=query.per_page, pages=math.ceil(total / query.per_page))
+    if query.fields:
+        matches = [{f: exercise[f] for f in query.fields} for exercise in matches]
+    listing['exercises'] = list(matches)
+    return listing
@@ -0,0 +1,157 @@
+"""Full-text search over the exercises table with SQLite FTS5.
+
+``exercises_fts`` is an external-content index: it stores only the search
+index and reads the text back from ``exercises``, and triggers keep it in
+step with every insert, update and delete. Bulk changes (e.g. the first
+CSV sync) drop the triggers and rebuild the index once instead.
+"""
+
+import re
+import sqlite3
+
+CREATE_TABLE = '''
+    CREATE VIRTUAL TABLE IF NOT EXISTS exercises_fts USING fts5(
+        exercise_name, primary_benefit, secondary_benefit, instructions,
+        content='exercises', content_rowid='id',
+        tokenize='porter unicode61 remove_diacritics 2', prefix='2 3'
+    )
+'''
+
+# Trigger name -> definition
+TRIGGERS = {
+    'exercises_fts_insert': '''
+    CREATE TRIGGER IF NOT EXISTS exercises_fts_insert AFTER INSERT ON exercises BEGIN
+        INSERT INTO exercises_fts (rowid, exercise_name, primary_benefit, secondary_benefit, instructions)
+        VALUES (new.id, new.exercise_name, new.primary_benefit, new.secondary_benefit, new.instructions);
+    END
+    ''',
+    'exercises_fts_delete': '''
+    CREATE TRIGGER IF NOT EXISTS exercises_fts_delete AFTER DELETE ON exercises BEGIN
+        INSERT INTO exercises_fts (exercises_fts, rowid, exercise_name, primary_benefit, secondary_benefit, instructions)
+        VALUES ('delete', old.id, old.exercise_name, old.primary_benefit, old.secondary_benefit, old.instructions);
+    END
+    ''',
+    # Only text changes touch the index; duration or source updates skip it
+    'exercises_fts_update': '''
+    CREATE TRIGGER IF NOT EXISTS exercises_fts_update
+    AFTER UPDATE OF exercise_name, primary_benefit, secondary_benefit, instructions ON exercises BEGIN
+        INSERT INTO exercises_fts (exercises_fts, rowid, exercise_name, primary_benefit, secondary_benefit, instructions)
+        VALUES ('delete', old.id, old.exercise_name, old.primary_benefit, old.secondary_benefit, old.instructions);
+        INSERT INTO exercises_fts (rowid, exercise_name, primary_benefit, secondary_benefit, instructions)
+        VALUES (new.id, new.exercise_name, new.primary_benefit, new.secondary_benefit, new.instructions);
+    END
+    '''
+}
+
+REBUILD = "INSERT INTO exercises_fts (exercises_fts) VALUES ('rebuild')"
+
+CREATE_STEPS = [
+    # Porter stemming matches "squats" to "squat"; prefix indexes make short
+    # prefix queries ("pu*", "squ*") index lookups
+    CREATE_TABLE,
+    *TRIGGERS.values(),
+    # Default ranking: name matches weigh most, then target muscles, description, instructions
+    "INSERT INTO exercises_fts (exercises_fts, rank) VALUES ('rank', 'bm25(10.0, 2.0, 4.0, 1.0)')",
+    REBUILD
+]
+
+# Above this share of the table, a bulk change rebuilds the index once
+# instead of updating it row by row from the triggers
+BULK_REBUILD_FRACTION = 0.05
+
+
+def suspend_index(conn):
+    """Drop the index triggers ahead of a bulk change; call inside its transaction.
+
+    Returns False (and changes nothing) if the database has no search index.
+    """
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'exercises_fts'").fetchone() is None:
+        return False
+    for name in TRIGGERS:
+        conn.execute(f'DROP TRIGGER IF EXISTS {name}')
+    return True
+
+
+def resume_index(conn):
+    """Rebuild the index from the exercises table and restore its triggers."""
+    conn.execute(REBUILD)
+    for trigger in TRIGGERS.values():
+        conn.execute(trigger)
+
+
+# Filler words in free-text goals that would only dilute the ranking
+STOPWORDS = frozenset('''
+    a an and are as at be by for from i in into is it me my of on or so the their to want with you your
+'''.split())
+
+_TOKEN = re.compile(r'\w+', re.UNICODE)
+
+
+def match_query(text, any_term=False):
+    """Turn user text into a safe FTS5 MATCH expression, or None if it has no terms.
+
+    Every term is quoted, so FTS syntax in the input is inert. For searches
+    the terms are ANDed and the last one, which may still be being typed, is
+    matched as a prefix. ``any_term`` ORs whole terms instead, for ranking
+    free text such as a workout goal. Stopwords are dropped unless the text
+    has nothing else.
+    """
+    words = list(dict.fromkeys(_TOKEN.findall(str(text or '').lower())))
+    terms = [f'"{t}"' for t in words if t not in STOPWORDS] or [f'"{t}"' for t in words]
+    if not terms:
+        return None
+    if any_term:
+        return ' OR '.join(terms)
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def search_exercises(conn, text, limit=20, offset=0, categories=None, difficulty=None,
+                     min_duration=None, max_duration=None, any_term=False):
+    """Exercise rows matching ``text``, best match first, as (row, score) pairs.
+
+    Durations are in minutes, compared the way the catalog reports them.
+    Lower scores are better (FTS5 bm25 convention).
+    """
+    match = match_query(text, any_term)
+    if match is None:
+        return []
+    sql = '''
+        SELECT e.id, e.category, e.exercise_name, e.duration_minutes, e.primary_benefit,
+               e.secondary_benefit, e.difficulty_level, e.instructions, exercises_fts.rank AS score
+        FROM exercises_fts JOIN exercises e ON e.id = exercises_fts.rowid
+        WHERE exercises_fts MATCH ?
+    '''
+    params = [match]
+    if categories:
+        sql += f" AND e.category IN ({', '.join('?' for _ in categories)})"
+        params.extend(categories)
+    if difficulty:
+        sql += ' AND lower(e.difficulty_level) = ?'
+        params.append(difficulty)
+    # Missing durations read as 0.5 minutes, as in the catalog
+    if min_duration is not None:
+        sql += ' AND COALESCE(NULLIF(e.duration_minutes, 0), 0.5) >= ?'
+        params.append(min_duration)
+    if max_duration is not None:
+        sql += ' AND COALESCE(NULLIF(e.duration_minutes, 0), 0.5) <= ?'
+        params.append(max_duration)
+    sql += ' ORDER BY exercises_fts.rank LIMIT ? OFFSET ?'
+    params.extend((limit, offset))
+    return [(row, row['score']) for row in conn.execute(sql, params)]
+
+
+def rank_ids(conn, text, categories=None, limit=200):
+    """Ids of the exercises best matching free text, best first; empty if FTS is unavailable."""
+    try:
+        return [row['id'] for row, _ in search_exercises(conn, text, limit, categories=categories, any_term=True)]
+    except sqlite3.OperationalError as e:
+        print(f"[WARN] Exercise search unavailable: {e}")
+        return []
+
+
+def prerank(exercises, ranked_ids):
+    """Move exercises found by the search to the front in rank order; the rest keep their order."""
+    position = {exercise_id: i for i, exercise_id in enumerate(ranked_ids)}
+    unranked = len(position)
+    return sorted(exercises, key=lambda exercise: position.get(exercise['id'], unranked))
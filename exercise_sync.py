@@ -0,0 +1,147 @@
+"""Bring the exercises table in line with the exercise CSV rows.
+
+Rows are matched on their natural key (category, name), so only exercises
+that are new, changed or removed are written, and row ids (which saved
+workouts and the LLM candidate ids refer to) stay stable.
+
+The ``source`` column tells the two kinds of rows apart: 'csv' rows mirror
+the CSV and are deleted when they leave it, 'custom' rows were added
+through the API and are never touched. Rows from before the column existed
+have no source; the first sync claims the ones matching a CSV row and
+marks the rest custom.
+
+Every change to the table also bumps ``catalog_version``, so processes
+caching the catalog can tell that another process changed it.
+"""
+
+import exercise_search
+
+SOURCE_CSV = 'csv'
+SOURCE_CUSTOM = 'custom'
+
+CREATE_VERSION_TABLE = '''
+    CREATE TABLE IF NOT EXISTS catalog_version (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        version INTEGER NOT NULL
+    )
+'''
+
+# exercises column -> CSV field
+COLUMNS = (
+    ('duration_minutes', 'duration'),
+    ('primary_benefit', 'description'),
+    ('secondary_benefit', 'target_muscles'),
+    ('difficulty_level', 'difficulty'),
+    ('instructions', 'instructions')
+)
+
+
+def _csv_values(row):
+    return tuple(row.get(field) for _, field in COLUMNS)
+
+
+def diff_exercises(existing, rows):
+    """Work out the changes needed to mirror ``rows`` (CSV records) in the table.
+
+    ``existing`` yields (id, category, name, source, *COLUMNS values) tuples.
+    Returns (inserts, updates, deletes, unclaimed): insert parameter tuples,
+    update parameter tuples ending with the row id, ids to delete, and ids
+    of source-less rows to mark custom.
+    """
+    csv_rows, unknown_rows = {}, {}
+    deletes, unclaimed = [], []
+    for row in existing:
+        row_id, category, name, source, values = row[0], row[1], row[2], row[3], tuple(row[4:])
+        key = (category, name)
+        if source == SOURCE_CSV:
+            if key in csv_rows:
+                # Duplicate CSV-owned rows can only come from an old bug; keep the first
+                deletes.append(row_id)
+            else:
+                csv_rows[key] = (row_id, values)
+        elif source is None:
+            unknown_rows.setdefault(key, []).append((row_id, values))
+
+    inserts, updates = [], []
+    seen = set()
+    for row in rows:
+        key = (row.get('category'), row.get('name'))
+        if key[0] is None or key[1] is None or key in seen:
+            continue
+        seen.add(key)
+        values = _csv_values(row)
+        current = csv_rows.pop(key, None)
+        if current is None and unknown_rows.get(key):
+            # Adopt a pre-existing row for this exercise instead of duplicating it
+            row_id, _ = unknown_rows[key].pop(0)
+            updates.append(values + (SOURCE_CSV, row_id))
+        elif current is None:
+            inserts.append(key + values + (SOURCE_CSV,))
+        elif current[1] != values:
+            updates.append(values + (SOURCE_CSV, current[0]))
+
+    # CSV-owned rows whose exercise left the CSV
+    deletes.extend(row_id for row_id, _ in csv_rows.values())
+    unclaimed.extend(row_id for group in unknown_rows.values() for row_id, _ in group)
+    return inserts, updates, deletes, unclaimed
+
+
+def catalog_version(conn):
+    """Version of the exercises table as recorded in the database."""
+    row = conn.execute('SELECT version FROM catalog_version WHERE id = 1').fetchone()
+    return row[0] if row is not None else 0
+
+
+def bump_catalog_version(conn):
+    """Record a change to the exercises table; call inside the writing transaction."""
+    conn.execute('''
+        INSERT INTO catalog_version (id, version) VALUES (1, 1)
+        ON CONFLICT (id) DO UPDATE SET version = version + 1
+    ''')
+    return catalog_version(conn)
+
+
+def sync_exercises(conn, rows):
+    """Apply the inserts, updates and deletes from diff_exercises in one transaction.
+
+    Returns the number of rows inserted, updated, deleted, unchanged and
+    newly marked custom. An empty ``rows`` (e.g. an unreadable CSV) changes
+    nothing rather than deleting the whole catalog.
+    """
+    if not rows:
+        return {'inserted': 0, 'updated': 0, 'deleted': 0, 'unchanged': 0, 'marked_custom': 0}
+    columns = [column for column, _ in COLUMNS]
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        existing = conn.execute(f'''
+            SELECT id, category, exercise_name, source, {', '.join(columns)} FROM exercises WHERE source IS NOT ?
+        ''', (SOURCE_CUSTOM,))
+        inserts, updates, deletes, unclaimed = diff_exercises(existing, rows)
+        changed = len(inserts) + len(updates) + len(deletes)
+        # Indexing row by row costs far more than one rebuild once much of the table changes
+        bulk = changed > exercise_search.BULK_REBUILD_FRACTION * len(rows) and exercise_search.suspend_index(conn)
+
+        conn.executemany(f'''
+            INSERT INTO exercises (category, exercise_name, {', '.join(columns)}, source)
+            VALUES (?, ?, {', '.join('?' for _ in columns)}, ?)
+        ''', inserts)
+        conn.executemany(f'''
+            UPDATE exercises SET {', '.join(f"{column} = ?" for column in columns)}, source = ? WHERE id = ?
+        ''', updates)
+        conn.executemany('DELETE FROM exercises WHERE id = ?', [(row_id,) for row_id in deletes])
+        conn.executemany('UPDATE exercises SET source = ? WHERE id = ?', [(SOURCE_CUSTOM, row_id) for row_id in unclaimed])
+        if bulk:
+            exercise_search.resume_index(conn)
+        if changed:
+            bump_catalog_version(conn)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return {
+        'inserted': len(inserts),
+        'updated': len(updates),
+        'deleted': len(deletes),
+        'unchanged': len({(r.get('category'), r.get('name')) for r in rows}) - len(inserts) - len(updates),
+        'marked_custom': len(unclaimed)
+    }
@@ -0,0 +1,35 @@
+# gunicorn -c gunicorn.conf.py app:app
+import gc
+import logging
+import os
+
+# Data loading and other app modules log through the standard logging module
+logging.basicConfig(level=logging.INFO, format='[%(process)d] %(levelname)s %(name)s: %(message)s')
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('GUNICORN_WORKERS', 2))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+
+# Import the app once in the master so workers fork with the data already loaded
+preload_app = True
+
+
+def when_ready(server):
+    """Load every dataset in the master, then freeze it so forks share the pages."""
+    import app
+    app.init_db()
+    app.populate_exercises_db()
+    app.exercise_catalog.snapshot()
+    for name, info in app.data_registry.preload(strict=True).items():
+        server.log.info(f"Loaded {name} in {info['load_ms']} ms")
+    # Keep the collector from touching (and so copying) the preloaded objects
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    """Drop per-process state inherited from the master."""
+    import app
+    # Keep-alive sockets to LM Studio must not be shared between processes
+    app.llm_client.reset()
+    # A no-op when the master already preloaded
+    app.data_registry.preload()
@@ -0,0 +1,143 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+
+def make_cache_key(domains, duration, difficulty, focus, goal, catalog_fingerprint):
+    """Hash the normalized generation parameters together with the catalog they ran against."""
+    normalized = {
+        'domains': sorted({str(d).strip() for d in domains}),
+        'duration': int(duration),
+        'difficulty': str(difficulty or '').strip().lower(),
+        'focus': ' '.join(str(focus or '').lower().split()),
+        'goal': ' '.join(str(goal or '').lower().split()),
+        'catalog': catalog_fingerprint
+    }
+    payload = json.dumps(normalized, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """Thread-safe LRU cache with per-entry TTL and optional JSON file persistence.
+
+    Values are stored as encoded JSON so every hit hands back a fresh copy
+    that callers are free to mutate. With a ``path``, new entries are
+    written out in the background every ``save_every`` puts and by
+    ``flush()`` (e.g. at exit), merged with what other processes saved.
+    """
+
+    def __init__(self, max_size=256, ttl=3600, path=None, save_every=20):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.path = path
+        self.save_every = save_every
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._unsaved = 0
+        self.hits = 0
+        self.misses = 0
+        self.saves = 0
+        if path:
+            self._entries.update(self._read())
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def get(self, key):
+        """Return a copy of the cached value, or None if missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.time():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            encoded = entry[1]
+        return json.loads(encoded)
+
+    def put(self, key, value):
+        """Store a value, evicting the least recently used entry when full."""
+        encoded = json.dumps(value, separators=(',', ':'))
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl, encoded)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+            self._unsaved += 1
+            save = self.path and self._unsaved >= self.save_every
+            if save:
+                self._unsaved = 0
+        if save:
+            # Keep the file write off the request thread
+            threading.Thread(target=self.flush, name='llm-cache-save', daemon=True).start()
+
+    def flush(self):
+        """Write the cache to ``path`` now, merged with the entries already on disk."""
+        if not self.path:
+            return
+        with self._save_lock:
+            with self._lock:
+                entries = dict(self._entries)
+                self._unsaved = 0
+            # Other workers share the file; keep their entries alongside ours
+            merged = self._read()
+            merged.update(entries)
+            self._write(merged)
+
+    def clear(self):
+        """Remove every entry, including the persisted copy."""
+        with self._lock:
+            self._entries.clear()
+            self._unsaved = 0
+        if self.path:
+            with self._save_lock:
+                self._write({})
+
+    def stats(self):
+        """Cache counters for the debug endpoint."""
+        return {
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'ttl': self.ttl,
+            'persistent': bool(self.path),
+            'saves': self.saves,
+            'hits': self.hits,
+            'misses': self.misses
+        }
+
+    def _read(self):
+        # Unexpired entries from the file, oldest first
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                stored = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            print(f"Could not load LLM response cache from {self.path}: {e}")
+            return {}
+        now = time.time()
+        return {key: (expires_at, encoded) for key, expires_at, encoded in stored if expires_at > now}
+
+    def _write(self, entries):
+        # Write a private temp file and swap it in, so a crash never leaves a
+        # torn cache and concurrent workers never write into the same file
+        entries = sorted(entries.items(), key=lambda item: item[1][0])[-self.max_size:]
+        directory = os.path.dirname(os.path.abspath(self.path))
+        try:
+            fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(self.path) + '.', suffix='.tmp', dir=directory)
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump([[key, expires_at, encoded] for key, (expires_at, encoded) in entries], f)
+                os.replace(tmp_path, self.path)
+            except Exception:
+                os.unlink(tmp_path)
+                raise
+            self.saves += 1
+        except Exception as e:
+            print(f"Could not persist LLM response cache to {self.path}: {e}")
@@ -0,0 +1,241 @@
+import http.client
+import json
+import queue
+import threading
+import time
+from urllib.parse import urlsplit
+
+# Errors that mean a pooled keep-alive connection was closed by the server
+_STALE_CONNECTION_ERRORS = (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError)
+
+
+class LLMClientError(Exception):
+    """Raised when the LLM server cannot be reached or returns an error."""
+
+
+class CircuitOpenError(LLMClientError):
+    """Raised without contacting the server while the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """Stops calls after repeated failures and lets a single trial through after a cool-down."""
+
+    def __init__(self, failure_threshold=3, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return 'half-open'
+        return 'open'
+
+    def before_call(self):
+        """Raise CircuitOpenError unless a call is currently allowed."""
+        with self._lock:
+            state = self.state
+            if state == 'open' or (state == 'half-open' and self._trial_running):
+                raise CircuitOpenError('LLM circuit breaker is open')
+            if state == 'half-open':
+                self._trial_running = True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_running = False
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+    def release_trial(self):
+        """End a call that finished without an outcome, so the next one may be the trial."""
+        with self._lock:
+            self._trial_running = False
+
+
+class LLMClient:
+    """Client for an OpenAI-compatible server (LM Studio) with keep-alive pooling.
+
+    Connections are reused across requests, the loaded model id is cached
+    for ``model_ttl`` seconds, and a circuit breaker fails fast once the
+    server has failed ``failure_threshold`` times in a row.
+    """
+
+    def __init__(self, base_url, timeout=10, pool_size=4, model_ttl=300,
+                 failure_threshold=3, reset_timeout=30):
+        parts = urlsplit(base_url)
+        self._connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+        self._host = parts.hostname
+        self._port = parts.port
+        self._base_path = parts.path.rstrip('/')
+        self.timeout = timeout
+        self.model_ttl = model_ttl
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self._pool = queue.LifoQueue(maxsize=pool_size)
+        self._model = None
+        self._model_fetched_at = 0
+        self.connections_opened = 0
+
+    def loaded_model(self):
+        """Return the id of the loaded model, refreshing the cached value after its TTL."""
+        if self._model and time.monotonic() - self._model_fetched_at < self.model_ttl:
+            return self._model
+        try:
+            models = self._request('GET', '/models', timeout=2).get('data', [])
+            self._model = models[0].get('id', 'local-model') if models else 'local-model'
+        except LLMClientError as e:
+            print(f"LM Studio model lookup failed: {e}")
+            return self._model or 'local-model'
+        self._model_fetched_at = time.monotonic()
+        return self._model
+
+    def invalidate_model(self):
+        """Forget the cached model id so the next call looks it up again."""
+        self._model = None
+
+    def chat_completion(self, payload):
+        """POST a chat completion and return the decoded JSON response."""
+        try:
+            return self._request('POST', '/chat/completions', payload)
+        except LLMClientError:
+            # The loaded model may have changed; look it up again next time
+            self.invalidate_model()
+            raise
+
+    def stream_chat_completion(self, payload):
+        """POST a streaming chat completion and yield the raw SSE lines.
+
+        A stream the caller abandons (closed early, or dropped after an error
+        in the consumer) records no outcome but still frees the breaker's
+        half-open trial.
+        """
+        payload = dict(payload, stream=True)
+        conn, response = self._send('POST', '/chat/completions', payload)
+        reusable = False
+        recorded = False
+        try:
+            if response.status >= 400:
+                response.read()
+                recorded = True
+                self._record_status(response.status)
+                self.invalidate_model()
+                raise LLMClientError(f"HTTP {response.status} from /chat/completions")
+            while True:
+                line = response.readline()
+                if not line:
+                    break
+                yield line
+            recorded = True
+            self.breaker.record_success()
+            reusable = not response.will_close
+        except (OSError, http.client.HTTPException) as e:
+            recorded = True
+            self.breaker.record_failure()
+            raise LLMClientError(str(e)) from e
+        finally:
+            if not recorded:
+                self.breaker.release_trial()
+            self._release(conn, reusable)
+
+    def reset(self):
+        """Close pooled connections, e.g. after forking a worker process."""
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                break
+
+    def stats(self):
+        """Client counters for the debug endpoint."""
+        return {
+            'circuit': self.breaker.state,
+            'consecutive_failures': self.breaker.failures,
+            'cached_model': self._model,
+            'pooled_connections': self._pool.qsize(),
+            'connections_opened': self.connections_opened
+        }
+
+    def _request(self, method, path, payload=None, timeout=None):
+        conn, response = self._send(method, path, payload, timeout)
+        reusable = False
+        try:
+            body = response.read()
+            reusable = not response.will_close
+        except (OSError, http.client.HTTPException) as e:
+            self.breaker.record_failure()
+            raise LLMClientError(str(e)) from e
+        finally:
+            self._release(conn, reusable)
+
+        self._record_status(response.status)
+        if response.status >= 400:
+            raise LLMClientError(f"HTTP {response.status} from {path}")
+        try:
+            return json.loads(body.decode('utf-8'))
+        except ValueError as e:
+            raise LLMClientError(f"Invalid JSON from {path}: {e}") from e
+
+    def _record_status(self, status):
+        # Only server-side errors count against the breaker; a 4xx still
+        # proves the server is up
+        if status >= 500:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+
+    def _send(self, method, path, payload=None, timeout=None):
+        """Send a request on a pooled connection and return (connection, response)."""
+        # Encode first: an unencodable payload must not claim the half-open trial
+        body = json.dumps(payload).encode('utf-8') if payload is not None else None
+        self.breaker.before_call()
+        headers = {'Content-Type': 'application/json'} if body is not None else {}
+
+        conn, reused = self._acquire()
+        while True:
+            conn.timeout = timeout or self.timeout
+            if conn.sock is not None:
+                conn.sock.settimeout(conn.timeout)
+            try:
+                conn.request(method, self._base_path + path, body=body, headers=headers)
+                return conn, conn.getresponse()
+            except _STALE_CONNECTION_ERRORS as e:
+                conn.close()
+                if not reused:
+                    self.breaker.record_failure()
+                    raise LLMClientError(str(e)) from e
+                # The server dropped an idle keep-alive connection; retry on a fresh one
+                conn, reused = self._new_connection(), False
+            except (OSError, http.client.HTTPException) as e:
+                conn.close()
+                self.breaker.record_failure()
+                raise LLMClientError(str(e)) from e
+
+    def _acquire(self):
+        try:
+            return self._pool.get_nowait(), True
+        except queue.Empty:
+            return self._new_connection(), False
+
+    def _new_connection(self):
+        self.connections_opened += 1
+        return self._connection_class(self._host, self._port, timeout=self.timeout)
+
+    def _release(self, conn, reusable):
+        if not reusable:
+            conn.close()
+            return
+        try:
+            self._pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
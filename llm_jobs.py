@@ -0,0 +1,142 @@
+import json
+import threading
+import time
+import traceback
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+CREATE_TABLE = '''
+    CREATE TABLE IF NOT EXISTS generation_jobs (
+        job_id TEXT PRIMARY KEY,
+        status TEXT NOT NULL,
+        result TEXT,
+        created REAL NOT NULL
+    ) WITHOUT ROWID
+'''
+
+
+class GenerationJobs:
+    """Runs LLM generations on a worker pool and keeps their results for polling.
+
+    At most ``max_pending`` generations are queued or running; ``submit``
+    returns None beyond that, so callers skip the LLM instead of piling up
+    work it will finish long after anyone polls for it.
+
+    With ``connect``, jobs and their results are also written to the
+    ``generation_jobs`` table, so a poll that reaches another process (e.g.
+    a second gunicorn worker) still finds them. Without it jobs live in
+    process memory only and polls must reach the process that accepted them.
+    Unknown or expired ids report 'unknown'.
+    """
+
+    def __init__(self, max_workers=2, max_jobs=500, ttl=600, max_pending=20, connect=None):
+        self.max_jobs = max_jobs
+        self.max_pending = max_pending
+        self.ttl = ttl
+        self.connect = connect
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='llm-job')
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.rejected = 0
+
+    def submit(self, job_id, fn, *args, **kwargs):
+        """Schedule ``fn(*args, **kwargs)`` under ``job_id``; None if too many jobs are pending."""
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.rejected += 1
+                return None
+            self._pending += 1
+        created = time.time()
+        if self.connect is not None:
+            self._store(job_id, 'pending', None, created)
+        future = self._executor.submit(fn, *args, **kwargs)
+        future.add_done_callback(lambda future: self._finished(job_id, future, created))
+        with self._lock:
+            self._jobs[job_id] = (created, future)
+            self._prune()
+        return future
+
+    def status(self, job_id):
+        """Return (status, result) where status is pending, ready, failed or unknown."""
+        with self._lock:
+            self._prune()
+            entry = self._jobs.get(job_id)
+        if entry is None:
+            return self._load(job_id)
+        future = entry[1]
+        if not future.done():
+            return 'pending', None
+        if future.cancelled() or future.exception() is not None or not future.result():
+            return 'failed', None
+        return 'ready', future.result()
+
+    def stats(self):
+        """Job counters for the debug endpoint."""
+        with self._lock:
+            futures = [future for _, future in self._jobs.values()]
+            pending = self._pending
+        return {
+            'tracked': len(futures),
+            'pending': pending,
+            'max_pending': self.max_pending,
+            'rejected': self.rejected,
+            'shared': self.connect is not None
+        }
+
+    def shutdown(self):
+        """Stop accepting jobs and wait for running generations to finish."""
+        self._executor.shutdown(wait=True)
+
+    def _finished(self, job_id, future, created):
+        with self._lock:
+            self._pending -= 1
+        if self.connect is None:
+            return
+        if future.cancelled() or future.exception() is not None or not future.result():
+            self._store(job_id, 'failed', None, created)
+        else:
+            self._store(job_id, 'ready', future.result(), created)
+
+    def _store(self, job_id, status, result, created):
+        conn = self.connect()
+        try:
+            conn.execute('''
+                INSERT INTO generation_jobs (job_id, status, result, created) VALUES (?, ?, ?, ?)
+                ON CONFLICT (job_id) DO UPDATE SET status = excluded.status, result = excluded.result
+            ''', (job_id, status, json.dumps(result) if result is not None else None, created))
+            if status != 'pending':
+                # Finished jobs are written off the request path, so expire old rows here
+                conn.execute('DELETE FROM generation_jobs WHERE created < ?', (time.time() - self.ttl,))
+            conn.commit()
+        except Exception:
+            print(f"[ERROR] Could not store generation job {job_id}:")
+            traceback.print_exc()
+            if conn.in_transaction:
+                conn.rollback()
+        finally:
+            conn.close()
+
+    def _load(self, job_id):
+        if self.connect is None:
+            return 'unknown', None
+        conn = self.connect()
+        try:
+            row = conn.execute('SELECT status, result, created FROM generation_jobs WHERE job_id = ?',
+                               (job_id,)).fetchone()
+        finally:
+            conn.close()
+        if row is None or row[2] < time.time() - self.ttl:
+            return 'unknown', None
+        return row[0], json.loads(row[1]) if row[1] else None
+
+    def _prune(self):
+        # Drop expired jobs, then the oldest ones once over capacity; a
+        # forgotten job that has not started yet is cancelled
+        cutoff = time.time() - self.ttl
+        while self._jobs:
+            job_id, (created, future) = next(iter(self._jobs.items()))
+            if created >= cutoff and len(self._jobs) <= self.max_jobs:
+                break
+            future.cancel()
+            del self._jobs[job_id]
@@ -0,0 +1,109 @@
+import json
+
+
+def iter_sse_data(lines):
+    """Yield the data payloads of an OpenAI-compatible SSE stream until [DONE].
+
+    The rest of the stream is still drained so a keep-alive connection can be reused.
+    """
+    done = False
+    for raw in lines:
+        if done:
+            continue
+        line = raw.decode('utf-8') if isinstance(raw, bytes) else raw
+        line = line.strip()
+        if not line.startswith('data:'):
+            continue
+        data = line[5:].strip()
+        if data == '[DONE]':
+            done = True
+        elif data:
+            yield data
+
+
+def iter_completion_deltas(lines):
+    """Yield the content fragments from a streamed chat completion."""
+    for data in iter_sse_data(lines):
+        try:
+            chunk = json.loads(data)
+        except ValueError:
+            continue
+        for choice in chunk.get('choices', []):
+            content = (choice.get('delta') or {}).get('content')
+            if content:
+                yield content
+
+
+def format_sse(event, data):
+    """Encode one Server-Sent Event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+class IncrementalExerciseParser:
+    """Pull exercise objects out of a partially streamed workout JSON document.
+
+    Text is fed in as it arrives; each object in the top-level "exercises"
+    array is returned as soon as its closing brace has been seen. Only the
+    new text is scanned on each feed, so the work is linear in the response.
+    """
+
+    def __init__(self):
+        self.text = ''
+        self._pos = 0
+        self._array_start = None
+        self._array_done = False
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._object_start = None
+
+    def feed(self, fragment):
+        """Add streamed text and return any exercises completed by it."""
+        self.text += fragment
+        if self._array_done:
+            return []
+        if self._array_start is None and not self._find_array():
+            return []
+
+        completed = []
+        text = self.text
+        while self._pos < len(text):
+            ch = text[self._pos]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif ch == '\\':
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch == '{':
+                if self._depth == 0:
+                    self._object_start = self._pos
+                self._depth += 1
+            elif ch == '}':
+                self._depth -= 1
+                if self._depth == 0 and self._object_start is not None:
+                    try:
+                        completed.append(json.loads(text[self._object_start:self._pos + 1]))
+                    except ValueError:
+                        pass
+                    self._object_start = None
+            elif ch == ']' and self._depth == 0:
+                self._array_done = True
+                self._pos += 1
+                break
+            self._pos += 1
+        return completed
+
+    def _find_array(self):
+        key = self.text.find('"exercises"')
+        if key == -1:
+            return False
+        bracket = self.text.find('[', key)
+        if bracket == -1:
+            return False
+        self._array_start = bracket
+        self._pos = bracket + 1
+        return True
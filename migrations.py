@@ -0,0 +1,158 @@
+"""Schema migrations tracked with ``PRAGMA user_version``.
+
+init_db creates the original tables; every later schema change is appended
+here as (version, description, steps). A step is either an SQL statement or
+a callable taking the connection. Versions must only ever be appended.
+"""
+
+import dashboard
+import exercise_search
+import exercise_sync
+import llm_jobs
+import progress_rollup
+import saved_workouts
+import streaks
+
+MIGRATIONS = [
+    (1, 'Indexes for progress, session history and saved workout lookups', [
+        # Merge duplicate (user_id, domain) progress rows so the pair can be made unique
+        '''
+        UPDATE user_progress
+        SET sessions_completed = (SELECT SUM(p.sessions_completed) FROM user_progress p
+                                  WHERE p.user_id IS user_progress.user_id AND p.domain IS user_progress.domain),
+            total_minutes = (SELECT SUM(p.total_minutes) FROM user_progress p
+                             WHERE p.user_id IS user_progress.user_id AND p.domain IS user_progress.domain),
+            last_session_date = (SELECT MAX(p.last_session_date) FROM user_progress p
+                                 WHERE p.user_id IS user_progress.user_id AND p.domain IS user_progress.domain)
+        WHERE id IN (SELECT MIN(id) FROM user_progress GROUP BY user_id, domain HAVING COUNT(*) > 1)
+        ''',
+        '''
+        DELETE FROM user_progress
+        WHERE id NOT IN (SELECT MIN(id) FROM user_progress GROUP BY user_id, domain)
+        ''',
+        'CREATE UNIQUE INDEX IF NOT EXISTS idx_user_progress_user_domain ON user_progress (user_id, domain)',
+        'CREATE INDEX IF NOT EXISTS idx_user_sessions_user_date ON user_sessions (user_id, session_date)',
+        'CREATE INDEX IF NOT EXISTS idx_saved_workouts_user_created ON saved_workouts (user_id, created_date)'
+    ]),
+    (2, 'Weekly per-domain progress rollup', [
+        progress_rollup.CREATE_TABLE,
+        progress_rollup.rebuild_rollups
+    ]),
+    (3, 'Per-user streak state', [
+        streaks.CREATE_TABLE,
+        streaks.rebuild_streaks
+    ]),
+    (4, 'Programs each user follows', [
+        '''
+        CREATE TABLE IF NOT EXISTS user_programs (
+            user_id INTEGER NOT NULL,
+            program_id TEXT NOT NULL,
+            position INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, program_id)
+        ) WITHOUT ROWID
+        '''
+    ]),
+    # Existing rows keep a NULL source; the next exercise sync classifies them
+    (5, 'Track where each exercise came from', [
+        'ALTER TABLE exercises ADD COLUMN source TEXT'
+    ]),
+    (6, 'Full-text search index over exercises', exercise_search.CREATE_STEPS),
+    (7, 'Saved workout exercises as rows instead of JSON blobs', [
+        saved_workouts.CREATE_ITEMS_TABLE,
+        'ALTER TABLE saved_workouts ADD COLUMN exercise_count INTEGER NOT NULL DEFAULT 0',
+        'ALTER TABLE saved_workouts ADD COLUMN preview TEXT',
+        saved_workouts.migrate_blobs
+    ]),
+    (8, 'Copy exercise text into saved workout items', [
+        saved_workouts.add_text_columns
+    ]),
+    (9, 'Exercise catalog version shared between processes', [
+        exercise_sync.CREATE_VERSION_TABLE,
+        'INSERT OR IGNORE INTO catalog_version (id, version) VALUES (1, 1)'
+    ]),
+    # Older sessions keep a NULL domain_progress; rollups rebuild them from their exercise list
+    (10, 'Store the completed domain progress with each session', [
+        'ALTER TABLE user_sessions ADD COLUMN domain_progress TEXT'
+    ]),
+    (11, 'Per-user data version for dashboard caches', [
+        dashboard.CREATE_VERSION_TABLE
+    ]),
+    (12, 'Background generation results shared between workers', [
+        llm_jobs.CREATE_TABLE
+    ])
+]
+
+# Hot queries and the index each of them must use
+QUERY_PLAN_CHECKS = [
+    ('recent sessions', 'idx_user_sessions_user_date', '''
+        SELECT session_date, total_duration, session_type FROM user_sessions
+        WHERE user_id = ? ORDER BY session_date DESC LIMIT 10
+    ''', (1,)),
+    ('session count', 'idx_user_sessions_user_date', '''
+        SELECT COUNT(*) FROM user_sessions WHERE user_id = ?
+    ''', (1,)),
+    ('progress by domain', 'idx_user_progress_user_domain', '''
+        SELECT id FROM user_progress WHERE user_id = ? AND domain = ?
+    ''', (1, 'endurance')),
+    ('progress by user', 'idx_user_progress_user_domain', '''
+        SELECT domain, sessions_completed, total_minutes FROM user_progress WHERE user_id = ?
+    ''', (1,)),
+    ('weekly progress', 'PRIMARY KEY', '''
+        SELECT domain, SUM(minutes) FROM user_weekly_progress WHERE user_id = ? GROUP BY domain
+    ''', (1,)),
+    ('saved workouts', 'idx_saved_workouts_user_created', '''
+        SELECT id FROM saved_workouts WHERE user_id = ? ORDER BY created_date DESC, id DESC LIMIT 12
+    ''', ('1',)),
+    ('saved workout items', 'PRIMARY KEY', '''
+        SELECT name FROM saved_workout_items WHERE workout_id = ? ORDER BY position
+    ''', (1,)),
+    # FTS5 reports its own index; ranking happens inside it rather than in a temp B-tree
+    ('exercise search', 'VIRTUAL TABLE INDEX', '''
+        SELECT e.id FROM exercises_fts JOIN exercises e ON e.id = exercises_fts.rowid
+        WHERE exercises_fts MATCH ? ORDER BY exercises_fts.rank LIMIT 20
+    ''', ('squat',))
+]
+
+
+def schema_version(conn):
+    """Return the schema version recorded in the database."""
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def run_migrations(conn):
+    """Apply pending migrations in order, each in its own transaction."""
+    for version, description, steps in MIGRATIONS:
+        if version <= schema_version(conn):
+            continue
+        # Take the write lock first so concurrent workers apply each migration once
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if version <= schema_version(conn):
+                conn.rollback()
+                continue
+            print(f"Applying migration {version}: {description}")
+            for step in steps:
+                if callable(step):
+                    step(conn)
+                else:
+                    conn.execute(step)
+            conn.execute(f'PRAGMA user_version = {version}')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return schema_version(conn)
+
+
+def check_query_plans(conn):
+    """Run EXPLAIN QUERY PLAN on the hot queries.
+
+    Returns (name, expected index, plan text, ok) tuples; ok is False when
+    a query would not use its index.
+    """
+    results = []
+    for name, index, sql, params in QUERY_PLAN_CHECKS:
+        plan = ' / '.join(row[3] for row in conn.execute(f'EXPLAIN QUERY PLAN {sql}', params))
+        ok = index in plan and 'USE TEMP B-TREE' not in plan
+        results.append((name, index, plan, ok))
+    return results
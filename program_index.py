@@ -0,0 +1,82 @@
+"""Training programs indexed by (program_id, week, weekday).
+
+Program rows are parsed once when the data is loaded, so finding today's
+session is a dict lookup instead of a scan with per-row string handling.
+A program CSV may hold several programs in a ``Program`` column; rows
+without one belong to the program the file is registered under.
+"""
+
+DEFAULT_PROGRAM_ID = 'core'
+
+WEEKDAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+
+# training_data key -> (default program id, column for each session field)
+PROGRAM_SOURCES = {
+    'program': (DEFAULT_PROGRAM_ID, {
+        'name': 'Type',
+        'description': 'Description',
+        'duration': 'Duration',
+        'difficulty': 'Intensity',
+        'focus': 'Focus'
+    }),
+    'student_program': ('student', {
+        'name': 'Session_Type',
+        'description': 'Progression_Notes',
+        'duration': 'Duration_Minutes',
+        'difficulty': None,
+        'focus': 'Focus_Areas'
+    })
+}
+
+
+def _value(entry, column):
+    value = entry.get(column) if column else None
+    # Missing CSV cells may arrive as NaN, which is truthy
+    if value is None or value != value or str(value).strip() == '':
+        return None
+    return value
+
+
+def _session(entry, columns):
+    focus = _value(entry, columns['focus'])
+    return {
+        'name': _value(entry, columns['name']),
+        'description': _value(entry, columns['description']) or f"Focus: {focus}",
+        'duration': _value(entry, columns['duration']),
+        'difficulty': _value(entry, columns['difficulty']),
+        'focus': focus or ''
+    }
+
+
+def build_program_index(training_data):
+    """Map (program_id, week, weekday 0-6) to the session dict shown on the dashboard.
+
+    The first row wins when a program lists the same day twice, matching
+    the order the old scan returned.
+    """
+    index = {}
+    for key, (default_id, columns) in PROGRAM_SOURCES.items():
+        for entry in (training_data or {}).get(key) or []:
+            try:
+                week = int(entry.get('Week', 1))
+                weekday = WEEKDAYS.index(str(entry.get('Day', '')).strip().lower())
+            except (TypeError, ValueError):
+                continue
+            program_id = str(_value(entry, 'Program') or default_id).strip()
+            index.setdefault((program_id, week, weekday), _session(entry, columns))
+    return index
+
+
+def program_ids(index):
+    """Sorted ids of the programs present in ``index``."""
+    return sorted({program_id for program_id, _, _ in index})
+
+
+def find_session(index, programs, week, day):
+    """Today's session from the first of ``programs`` scheduling one for ``day``."""
+    weekday = day.weekday()
+    for program_id in programs or [DEFAULT_PROGRAM_ID]:
+        session = index.get((program_id, int(week), weekday))
+        if session is not None:
+            return session
+    return None
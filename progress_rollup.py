@@ -0,0 +1,169 @@
+"""Per-user, per-ISO-week, per-domain progress totals.
+
+``user_weekly_progress`` is maintained incrementally when a session is
+completed, so the progress pages read pre-aggregated rows instead of
+scanning ``user_sessions``. ``rebuild_rollups`` recomputes it from the
+session history for backfills, using the domainProgress each session
+stored when it was completed.
+"""
+
+import json
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+# Number of weeks shown in the progress chart, oldest first
+CHART_WEEKS = 4
+
+CREATE_TABLE = '''
+    CREATE TABLE IF NOT EXISTS user_weekly_progress (
+        user_id INTEGER NOT NULL,
+        domain TEXT NOT NULL,
+        week_start DATE NOT NULL,
+        sessions INTEGER NOT NULL DEFAULT 0,
+        exercises INTEGER NOT NULL DEFAULT 0,
+        minutes REAL NOT NULL DEFAULT 0,
+        PRIMARY KEY (user_id, domain, week_start)
+    ) WITHOUT ROWID
+'''
+
+# Same mapping the session page uses to build domainProgress
+DOMAIN_KEYS = {
+    'strength': 'strength_power',
+    'strength & power': 'strength_power',
+    'speed': 'speed_mobility',
+    'speed & mobility': 'speed_mobility',
+    'mobility': 'speed_mobility',
+    'endurance': 'endurance',
+    'agility': 'agility',
+    'cognitive': 'cognition',
+    'cognition': 'cognition'
+}
+
+_UPSERT = '''
+    INSERT INTO user_weekly_progress (user_id, domain, week_start, sessions, exercises, minutes)
+    VALUES (?, ?, date(?, 'weekday 0', '-6 days'), ?, ?, ?)
+    ON CONFLICT (user_id, domain, week_start) DO UPDATE SET
+        sessions = sessions + excluded.sessions,
+        exercises = exercises + excluded.exercises,
+        minutes = minutes + excluded.minutes
+'''
+
+
+def domain_key(category):
+    """Map an exercise category to its progress domain, like the session page does."""
+    category = str(category or '').lower()
+    return DOMAIN_KEYS.get(category, category.replace(' & ', '_'))
+
+
+def week_start(day):
+    """Monday of the ISO week containing ``day``."""
+    return day - timedelta(days=day.weekday())
+
+
+def domain_totals(domain_progress):
+    """(domain, exercises, minutes) for each domain of a domainProgress payload.
+
+    Domains without completed exercises are skipped, as in update_user_progress.
+    """
+    return [
+        (domain, data.get('exercises', 0), data.get('minutes', 0))
+        for domain, data in domain_progress.items()
+        if data.get('exercises', 0) > 0
+    ]
+
+
+def chart_weeks(today, weeks=CHART_WEEKS):
+    """Mondays of the last ``weeks`` weeks up to ``today``, oldest first."""
+    return [week_start(today) - timedelta(weeks=i) for i in range(weeks - 1, -1, -1)]
+
+
+def week_labels(today, weeks=CHART_WEEKS):
+    """Chart labels for chart_weeks, e.g. 'Oct 12'."""
+    return [f"{day:%b} {day.day}" for day in chart_weeks(today, weeks)]
+
+
+def record_session(conn, user_id, domain_progress, session_date='now'):
+    """Add one completed session to the rollup, in the caller's transaction.
+
+    ``domain_progress`` is the session's domainProgress payload.
+    """
+    rows = [
+        (user_id, domain, session_date, 1, exercises, minutes)
+        for domain, exercises, minutes in domain_totals(domain_progress)
+    ]
+    conn.executemany(_UPSERT, rows)
+
+
+def read_progress(conn, user_id, today=None, weeks=CHART_WEEKS):
+    """Per-domain totals and the last ``weeks`` weekly minutes in one indexed query.
+
+    Returns ``(domains, weekly_minutes)`` where domains maps domain ->
+    {'sessions', 'exercises', 'minutes'} and weekly_minutes is oldest first.
+    """
+    today = today or datetime.utcnow().date()
+    starts = [day.isoformat() for day in chart_weeks(today, weeks)]
+    buckets = ', '.join(f"SUM(CASE WHEN week_start = ? THEN minutes ELSE 0 END) AS w{i}" for i in range(weeks))
+    rows = conn.execute(f'''
+        SELECT domain, SUM(sessions) AS sessions, SUM(exercises) AS exercises, SUM(minutes) AS minutes, {buckets}
+        FROM user_weekly_progress
+        WHERE user_id = ?
+        GROUP BY domain
+    ''', (*starts, user_id)).fetchall()
+
+    domains = {}
+    weekly_minutes = [0] * weeks
+    for row in rows:
+        domains[row['domain']] = {'sessions': row['sessions'], 'exercises': row['exercises'], 'minutes': row['minutes']}
+        for i in range(weeks):
+            weekly_minutes[i] += row[f'w{i}']
+    return domains, [round(m, 1) for m in weekly_minutes]
+
+
+def _planned_totals(exercises):
+    # Only sessions from before domain_progress was stored need this: the
+    # planned exercise list, which also counts exercises skipped in the session
+    per_domain = defaultdict(lambda: [0, 0])
+    for ex in exercises:
+        if isinstance(ex, dict) and ex.get('category'):
+            bucket = per_domain[domain_key(ex['category'])]
+            bucket[0] += 1
+            bucket[1] += float(ex.get('duration') or 0)
+    return [(domain, count, minutes) for domain, (count, minutes) in per_domain.items()]
+
+
+def rebuild_rollups(conn, user_id=None):
+    """Recompute the rollup from user_sessions (all users, or one).
+
+    Sessions are counted from the domainProgress stored with them, so the
+    totals match what record_session added. Returns the number of sessions read.
+    """
+    where, params = ('WHERE user_id = ?', (user_id,)) if user_id is not None else ('', ())
+    # The column does not exist yet when migration 2 backfills an old database
+    columns = {row[1] for row in conn.execute('PRAGMA table_info(user_sessions)')}
+    stored = 'domain_progress' if 'domain_progress' in columns else 'NULL'
+    totals = defaultdict(lambda: [0, 0, 0])
+    sessions = 0
+    for row in conn.execute(f'''
+        SELECT user_id, session_date, exercises_completed, {stored} AS domain_progress FROM user_sessions {where}
+    ''', params):
+        try:
+            day = date.fromisoformat(str(row['session_date'])[:10])
+            if row['domain_progress'] is not None:
+                per_domain = domain_totals(json.loads(row['domain_progress']))
+            else:
+                per_domain = _planned_totals(json.loads(row['exercises_completed'] or '[]'))
+        except (TypeError, ValueError, AttributeError):
+            continue
+        sessions += 1
+        for domain, count, minutes in per_domain:
+            total = totals[(row['user_id'], domain, week_start(day).isoformat())]
+            total[0] += 1
+            total[1] += count
+            total[2] += minutes
+
+    conn.execute(f'DELETE FROM user_weekly_progress {where}', params)
+    conn.executemany('''
+        INSERT INTO user_weekly_progress (user_id, domain, week_start, sessions, exercises, minutes)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', [(*key, *values) for key, values in totals.items()])
+    return sessions
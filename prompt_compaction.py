@@ -0,0 +1,150 @@
+import json
+import os
+import threading
+from collections import OrderedDict, namedtuple
+
+from catalog import normalize_difficulty
+
+# Upper bound on the number of candidate exercises embedded in the prompt
+MAX_CANDIDATES = int(os.environ.get('LLM_MAX_CANDIDATES', 40))
+
+DIFFICULTY_LEVELS = ['beginner', 'intermediate', 'advanced']
+
+# Fields copied from the catalog when the LLM's reply is mapped back by id
+EXERCISE_FIELDS = ('id', 'name', 'category', 'difficulty', 'description', 'target_muscles', 'instructions')
+
+# table: compact text embedded in the prompt
+# by_id: short id -> full catalog exercise
+# metrics: prompt size before/after compaction
+CandidateSet = namedtuple('CandidateSet', ['table', 'by_id', 'metrics'])
+
+
+def _level_distance(exercise, level):
+    try:
+        return abs(DIFFICULTY_LEVELS.index(normalize_difficulty(exercise['difficulty'])) - DIFFICULTY_LEVELS.index(level))
+    except ValueError:
+        return len(DIFFICULTY_LEVELS)
+
+
+# Key order and defaults of the candidate list as it was sent before compaction
+_LEGACY_FIELDS = (('name', None), ('category', None), ('duration', 0.5), ('difficulty', 'beginner'),
+                  ('description', ''), ('target_muscles', ''))
+# Characters json.dumps(indent=2) adds around one row's values: indentation,
+# quoted keys, separators and the quotes of the string values
+_LEGACY_ROW_OVERHEAD = len(json.dumps([{field: '' for field, _ in _LEGACY_FIELDS}], indent=2)) - len('[\n\n]')
+
+
+def _legacy_prompt_size(exercises):
+    # Size of the candidate block as it was sent before compaction, without
+    # encoding it: exact for plain strings and numbers, a slight
+    # underestimate when values need escaping
+    if not exercises:
+        return len('[]')
+    size = len('[\n\n]') + (len(exercises) - 1) * len(',\n') + len(exercises) * _LEGACY_ROW_OVERHEAD
+    for ex in exercises:
+        for field, default in _LEGACY_FIELDS:
+            value = ex.get(field, default)
+            if isinstance(value, str):
+                size += len(value)
+            elif value is None:
+                size += len('null') - len('""')
+            else:
+                # repr matches JSON for ints and finite floats
+                size += len(repr(value)) - len('""')
+    return size
+
+
+def _clean(value):
+    return ' '.join(str(value or '').replace('|', '/').split())
+
+
+def compact_candidates(exercises, duration, difficulty, max_candidates=None):
+    """Reduce candidate exercises to a short, tabular prompt block.
+
+    Drops exercises longer than the whole session, prefers the requested
+    difficulty (then the nearest levels), caps the list while keeping the
+    categories balanced, and gives each row a short id the model answers with.
+    """
+    max_candidates = max_candidates or MAX_CANDIDATES
+    level = normalize_difficulty(difficulty)
+
+    feasible = [ex for ex in exercises if ex['duration'] <= duration]
+    if level in DIFFICULTY_LEVELS:
+        # Stable sort keeps the incoming order within each difficulty distance
+        feasible.sort(key=lambda ex: _level_distance(ex, level))
+
+    by_category = OrderedDict()
+    for ex in feasible:
+        by_category.setdefault(ex['category'], []).append(ex)
+
+    # Round-robin across categories so a large category can't crowd out the rest
+    selected = []
+    position = 0
+    while len(selected) < max_candidates and any(position < len(group) for group in by_category.values()):
+        for group in by_category.values():
+            if position < len(group) and len(selected) < max_candidates:
+                selected.append(group[position])
+        position += 1
+
+    by_id = {}
+    sections = OrderedDict()
+    for i, ex in enumerate(selected, 1):
+        short_id = f"e{i}"
+        by_id[short_id] = ex
+        sections.setdefault(ex['category'], []).append(
+            f"{short_id}|{_clean(ex['name'])}|{ex['duration']:g}|{_clean(ex['difficulty'])}|{_clean(ex.get('target_muscles'))}"
+        )
+
+    lines = []
+    for category, rows in sections.items():
+        lines.append(f"## {category}")
+        lines.append("id|name|minutes|difficulty|targets")
+        lines.extend(rows)
+    table = '\n'.join(lines)
+
+    metrics = {
+        'candidates_before': len(exercises),
+        'candidates_after': len(selected),
+        'chars_before': _legacy_prompt_size(exercises),
+        'chars_after': len(table)
+    }
+    return CandidateSet(table, by_id, metrics)
+
+
+def expand_exercise(item, by_id):
+    """Map an exercise from the LLM reply back to its full catalog record.
+
+    Items referencing a short id get the catalog fields plus the duration the
+    model chose; exercises the model invented are returned unchanged.
+    """
+    source = by_id.get(str(item.get('id', '')).strip())
+    if source is None:
+        return item
+    exercise = {field: source.get(field) for field in EXERCISE_FIELDS if field in source}
+    exercise['duration'] = item.get('duration', source['duration'])
+    return exercise
+
+
+class PromptStats:
+    """Running prompt-size totals, reported by the debug endpoint."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.prompts = 0
+        self.chars_before = 0
+        self.chars_after = 0
+
+    def record(self, metrics):
+        with self._lock:
+            self.prompts += 1
+            self.chars_before += metrics['chars_before']
+            self.chars_after += metrics['chars_after']
+
+    def stats(self):
+        return {
+            'prompts': self.prompts,
+            'candidate_chars_before': self.chars_before,
+            'candidate_chars_after': self.chars_after,
+            # Rough token estimate at ~4 characters per token
+            'approx_tokens_saved': (self.chars_before - self.chars_after) // 4
+        }
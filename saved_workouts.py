@@ -0,0 +1,190 @@
+"""Saved workout templates stored as one row per exercise.
+
+``saved_workouts`` keeps the header plus a precomputed exercise count and
+name preview, so listing templates never touches their exercises.
+``saved_workout_items`` holds the exercises in order, each with its own
+copy of the exercise text: a template keeps working, unchanged, when its
+catalog exercises are edited or removed. Items that are catalog exercises
+also reference them by id; any other fields are kept in ``extra``.
+"""
+
+import json
+
+CREATE_ITEMS_TABLE = '''
+    CREATE TABLE IF NOT EXISTS saved_workout_items (
+        workout_id INTEGER NOT NULL,
+        position INTEGER NOT NULL,
+        exercise_id INTEGER,
+        name TEXT NOT NULL,
+        category TEXT,
+        duration REAL,
+        difficulty TEXT,
+        description TEXT,
+        target_muscles TEXT,
+        instructions TEXT,
+        extra TEXT,
+        PRIMARY KEY (workout_id, position)
+    ) WITHOUT ROWID
+'''
+
+# Length of the exercise-name preview shown on template cards
+PREVIEW_CHARS = 80
+
+# Item fields with their own column; the text fields are only set when present
+ITEM_COLUMNS = ('name', 'category', 'duration', 'difficulty')
+TEXT_COLUMNS = ('description', 'target_muscles', 'instructions')
+
+# Item field -> exercises column, for backfilling the text of catalog items
+CATALOG_COLUMNS = (
+    ('description', 'primary_benefit'),
+    ('target_muscles', 'secondary_benefit'),
+    ('instructions', 'instructions')
+)
+
+INSERT_ITEM = f'''
+    INSERT INTO saved_workout_items (workout_id, position, exercise_id, {', '.join(ITEM_COLUMNS + TEXT_COLUMNS)}, extra)
+    VALUES ({', '.join('?' for _ in range(4 + len(ITEM_COLUMNS) + len(TEXT_COLUMNS)))})
+'''
+
+
+def make_preview(names):
+    """Comma-separated exercise names, cut to PREVIEW_CHARS."""
+    preview = ', '.join(names)
+    return preview if len(preview) <= PREVIEW_CHARS else preview[:PREVIEW_CHARS] + '...'
+
+
+def _catalog_names(conn, exercises):
+    # id -> name for the exercises that reference a catalog row
+    ids = {ex['id'] for ex in exercises if isinstance(ex.get('id'), int)}
+    if not ids:
+        return {}
+    rows = conn.execute(f'''
+        SELECT id, exercise_name FROM exercises WHERE id IN ({', '.join('?' for _ in ids)})
+    ''', list(ids))
+    return {row['id']: row['exercise_name'] for row in rows}
+
+
+def item_rows(conn, workout_id, exercises):
+    """saved_workout_items parameter tuples for a workout's exercise list."""
+    names = _catalog_names(conn, exercises)
+    rows = []
+    for position, ex in enumerate(exercises):
+        # An id that now belongs to a different exercise is not a reference
+        linked = ex.get('id') in names and names[ex['id']] == ex.get('name')
+        extra = {key: value for key, value in ex.items()
+                 if key != 'id' and key not in ITEM_COLUMNS and key not in TEXT_COLUMNS}
+        if not linked and 'id' in ex:
+            extra['id'] = ex['id']
+        rows.append((
+            workout_id, position, ex['id'] if linked else None,
+            str(ex.get('name') or ''), ex.get('category'), ex.get('duration'), ex.get('difficulty'),
+            *(ex.get(field) for field in TEXT_COLUMNS),
+            json.dumps(extra) if extra else None
+        ))
+    return rows
+
+
+def save_workout(conn, user_id, name, description, exercises, total_duration, difficulty):
+    """Insert a workout and its items in one transaction; returns the new id."""
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        cursor = conn.execute('''
+            INSERT INTO saved_workouts (user_id, workout_name, workout_description, exercises_json,
+                                        total_duration, difficulty, exercise_count, preview)
+            VALUES (?, ?, ?, '', ?, ?, ?, ?)
+        ''', (user_id, name, description, total_duration, difficulty,
+              len(exercises), make_preview(str(ex.get('name') or '') for ex in exercises)))
+        workout_id = cursor.lastrowid
+        conn.executemany(INSERT_ITEM, item_rows(conn, workout_id, exercises))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return workout_id
+
+
+def list_workouts(conn, user_id, limit, offset=0):
+    """Summaries of a user's workouts, newest first; exercises are not loaded."""
+    rows = conn.execute('''
+        SELECT id, workout_name, workout_description, total_duration, difficulty, created_date,
+               exercise_count, preview
+        FROM saved_workouts
+        WHERE user_id = ?
+        ORDER BY created_date DESC, id DESC
+        LIMIT ? OFFSET ?
+    ''', (user_id, limit, offset))
+    return [dict(row) for row in rows]
+
+
+def load_workout(conn, user_id, workout_id):
+    """A user's workout with its exercises, or None if it does not exist."""
+    header = conn.execute('''
+        SELECT id, workout_name, workout_description, total_duration, difficulty, created_date,
+               exercise_count, preview, exercises_json
+        FROM saved_workouts WHERE id = ? AND user_id = ?
+    ''', (workout_id, user_id)).fetchone()
+    if header is None:
+        return None
+
+    items = conn.execute(f'''
+        SELECT exercise_id, {', '.join(ITEM_COLUMNS + TEXT_COLUMNS)}, extra
+        FROM saved_workout_items
+        WHERE workout_id = ?
+        ORDER BY position
+    ''', (workout_id,)).fetchall()
+
+    exercises = []
+    for item in items:
+        exercise = {'id': item['exercise_id']} if item['exercise_id'] is not None else {}
+        exercise.update((field, item[field]) for field in ITEM_COLUMNS)
+        exercise.update((field, item[field]) for field in TEXT_COLUMNS if item[field] is not None)
+        if item['extra']:
+            exercise.update(json.loads(item['extra']))
+        exercises.append(exercise)
+
+    workout = dict(header)
+    legacy = workout.pop('exercises_json')
+    if not exercises and legacy:
+        # A blob the migration could not convert is still served as it was
+        exercises = json.loads(legacy)
+    workout['exercises'] = exercises
+    return workout
+
+
+def migrate_blobs(conn):
+    """Move every exercises_json blob into saved_workout_items and fill the summary columns."""
+    rows = conn.execute("SELECT id, exercises_json FROM saved_workouts WHERE exercises_json != ''").fetchall()
+    migrated = 0
+    for row in rows:
+        try:
+            exercises = json.loads(row['exercises_json'])
+            if not isinstance(exercises, list) or not all(isinstance(ex, dict) for ex in exercises):
+                raise ValueError('not a list of exercises')
+        except ValueError as e:
+            print(f"[WARN] Leaving saved workout {row['id']} as JSON: {e}")
+            continue
+        conn.executemany(INSERT_ITEM, item_rows(conn, row['id'], exercises))
+        conn.execute('''
+            UPDATE saved_workouts SET exercises_json = '', exercise_count = ?, preview = ? WHERE id = ?
+        ''', (len(exercises), make_preview(str(ex.get('name') or '') for ex in exercises), row['id']))
+        migrated += 1
+    print(f"Migrated {migrated} of {len(rows)} saved workouts to saved_workout_items")
+
+
+def add_text_columns(conn):
+    """Give items stored without their text a copy of it from the catalog.
+
+    Databases created before the text columns existed only have the text of
+    catalog items in ``exercises``; copy it over while those rows exist.
+    """
+    existing = {row['name'] for row in conn.execute('PRAGMA table_info(saved_workout_items)')}
+    for field in TEXT_COLUMNS:
+        if field not in existing:
+            conn.execute(f'ALTER TABLE saved_workout_items ADD COLUMN {field} TEXT')
+    conn.execute(f'''
+        UPDATE saved_workout_items
+        SET {', '.join(f"{field} = (SELECT COALESCE({column}, '') FROM exercises e WHERE e.id = exercise_id)"
+                       for field, column in CATALOG_COLUMNS)}
+        WHERE exercise_id IS NOT NULL AND description IS NULL
+          AND EXISTS (SELECT 1 FROM exercises e WHERE e.id = exercise_id)
+    ''')
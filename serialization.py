@@ -0,0 +1,135 @@
+"""JSON encoding for API responses.
+
+``FastJSONProvider`` makes ``jsonify`` use orjson when it is installed and
+the stdlib encoder otherwise. ``PayloadCache`` keeps already-encoded
+response bodies for payloads that only change with a data version (the
+exercise catalog, rest times), so serving them again is a bytes copy.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+
+from flask import Response, current_app
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+BACKEND = 'orjson' if orjson is not None else 'json'
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider that encodes with orjson when available.
+
+    Output matches the default provider's compact form: keys are sorted,
+    and dates and other extra types go through the same ``default`` hook.
+    Anything orjson rejects (e.g. integers over 64 bits) is encoded by the
+    stdlib instead.
+    """
+
+    def _encode(self, obj):
+        if orjson is not None:
+            option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+            if self.sort_keys:
+                option |= orjson.OPT_SORT_KEYS
+            try:
+                return orjson.dumps(obj, default=self.default, option=option)
+            except TypeError:
+                pass
+        return super().dumps(obj, separators=(',', ':')).encode('utf-8')
+
+    def dumps(self, obj, **kwargs):
+        if kwargs or orjson is None:
+            return super().dumps(obj, **kwargs)
+        return self._encode(obj).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        if kwargs or orjson is None:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        # Debug mode keeps the indented stdlib output
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self._encode(obj) + b'\n', mimetype=self.mimetype)
+
+
+def encode(obj):
+    """Encode ``obj`` to JSON bytes the way ``jsonify`` would."""
+    provider = current_app.json
+    if isinstance(provider, FastJSONProvider):
+        return provider._encode(obj) + b'\n'
+    return provider.dumps(obj, separators=(',', ':')).encode('utf-8') + b'\n'
+
+
+class PayloadCache:
+    """LRU of encoded JSON bodies keyed by (name, data version, ...).
+
+    Each entry also stores a strong ETag, so conditional requests can be
+    answered without touching the body.
+    """
+
+    def __init__(self, max_size=128):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_encode(self, key, build, etag=None):
+        """Return (body, etag) for ``key``, encoding ``build()`` on a miss.
+
+        Without an ``etag`` one is derived from the encoded bytes.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+        # Encode outside the lock; two threads racing on a miss produce the same bytes
+        body = encode(build())
+        entry = (body, etag or hashlib.sha1(body).hexdigest()[:32])
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return entry
+
+    def respond(self, request, key, build, etag=None):
+        """Serve the cached body for ``key``, or an empty 304 if the client has it.
+
+        A known ``etag`` is checked before anything is built or looked up.
+        """
+        if etag is None or not request.if_none_match.contains(etag):
+            body, etag = self.get_or_encode(key, build, etag)
+            if not request.if_none_match.contains(etag):
+                return _with_etag(Response(body, mimetype='application/json'), etag)
+        return _with_etag(Response(status=304), etag)
+
+    def stats(self):
+        """Cache counters for the debug endpoint."""
+        with self._lock:
+            size = len(self._entries)
+            encoded_bytes = sum(len(body) for body, _ in self._entries.values())
+        return {
+            'backend': BACKEND,
+            'size': size,
+            'bytes': encoded_bytes,
+            'hits': self.hits,
+            'misses': self.misses
+        }
+
+
+def _with_etag(response, etag):
+    response.set_etag(etag)
+    # Clients may reuse their copy but must revalidate it on every request
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
@@ -0,0 +1,103 @@
+"""Timed session plans: every exercise followed by its rest, with offsets.
+
+The session page used to fetch /api/rest-times and work out each rest on
+the phone. A plan does that once on the server: rest after an exercise
+comes from the rest_times matrix for its category and the workout's
+difficulty, and every step carries its start and end second.
+"""
+
+import threading
+from collections import OrderedDict
+
+DEFAULT_REST_SECONDS = 30
+
+# Category labels used by workouts -> rest_times row (same mapping session.html used)
+CATEGORY_ALIASES = {
+    'Strength': 'Strength & Power',
+    'Speed': 'Speed & Mobility',
+    'Mobility': 'Speed & Mobility',
+    'Cognitive': 'Cognition'
+}
+
+
+def rest_seconds(rest_times, category, difficulty, default=DEFAULT_REST_SECONDS):
+    """Rest after an exercise of ``category`` at ``difficulty``."""
+    row = rest_times.get(CATEGORY_ALIASES.get(category, category)) or {}
+    # A stored 0 means no rest, not a missing value
+    seconds = row.get(str(difficulty or 'beginner').lower())
+    return default if seconds is None else seconds
+
+
+def work_seconds(exercise):
+    """Length of an exercise's work interval, as the session timer counts it."""
+    try:
+        return max(int(round(float(exercise.get('duration') or 0) * 60)), 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def build_session_plan(exercises, difficulty, rest_times):
+    """Interleave work and rest into steps with cumulative start/end seconds.
+
+    There is no rest after the last exercise. Steps refer to exercises by
+    their position, so the plan only depends on categories and durations.
+    """
+    steps = []
+    elapsed = work_total = rest_total = 0
+    for i, exercise in enumerate(exercises):
+        seconds = work_seconds(exercise)
+        steps.append({'type': 'work', 'exercise': i, 'seconds': seconds, 'start': elapsed, 'end': elapsed + seconds})
+        elapsed += seconds
+        work_total += seconds
+        if i + 1 < len(exercises):
+            seconds = rest_seconds(rest_times, exercise.get('category'), difficulty)
+            steps.append({'type': 'rest', 'exercise': i, 'seconds': seconds, 'start': elapsed, 'end': elapsed + seconds})
+            elapsed += seconds
+            rest_total += seconds
+    return {
+        'steps': steps,
+        'work_seconds': work_total,
+        'rest_seconds': rest_total,
+        'total_seconds': elapsed
+    }
+
+
+class SessionPlanCache:
+    """LRU of session plans keyed by what a plan depends on.
+
+    Regenerated, cached and saved workouts with the same exercises share
+    one plan. Plans are shared between requests and must not be mutated.
+    """
+
+    def __init__(self, max_size=512):
+        self.max_size = max_size
+        self._plans = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_build(self, exercises, difficulty, rest_times, version):
+        """Return the plan for a workout, building it on a miss.
+
+        ``version`` identifies the rest_times data, so reloaded rest times
+        produce new plans.
+        """
+        key = (version, str(difficulty or '').lower(),
+               tuple((exercise.get('category'), work_seconds(exercise)) for exercise in exercises))
+        with self._lock:
+            plan = self._plans.get(key)
+            if plan is not None:
+                self._plans.move_to_end(key)
+                self.hits += 1
+                return plan
+            self.misses += 1
+        plan = build_session_plan(exercises, difficulty, rest_times)
+        with self._lock:
+            self._plans[key] = plan
+            while len(self._plans) > self.max_size:
+                self._plans.popitem(last=False)
+        return plan
+
+    def stats(self):
+        """Cache counters for the debug endpoint."""
+        return {'size': len(self._plans), 'hits': self.hits, 'misses': self.misses}
@@ -0,0 +1,125 @@
+"""Training streaks, kept up to date as sessions are completed.
+
+A streak counts consecutive calendar days with at least one completed
+session. Days are taken in the user's timezone (sent by the browser, or
+APP_TIMEZONE), and the timezone used last is stored so reads agree with it.
+"""
+
+import os
+from datetime import date, datetime, timedelta
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+APP_TIMEZONE = os.environ.get('APP_TIMEZONE', 'UTC')
+
+CREATE_TABLE = '''
+    CREATE TABLE IF NOT EXISTS user_streaks (
+        user_id INTEGER PRIMARY KEY,
+        current_streak INTEGER NOT NULL DEFAULT 0,
+        longest_streak INTEGER NOT NULL DEFAULT 0,
+        last_active_day DATE,
+        timezone TEXT
+    )
+'''
+
+
+def resolve_timezone(name=None):
+    """Return a ZoneInfo for ``name``, falling back to APP_TIMEZONE, then UTC."""
+    for candidate in (name, APP_TIMEZONE):
+        if candidate:
+            try:
+                return ZoneInfo(str(candidate))
+            except (ZoneInfoNotFoundError, ValueError):
+                continue
+    return ZoneInfo('UTC')
+
+
+def local_day(timezone=None, now=None):
+    """The calendar day it currently is in ``timezone``."""
+    now = now or datetime.now(tz=ZoneInfo('UTC'))
+    return now.astimezone(resolve_timezone(timezone)).date()
+
+
+def next_streak(current, last_day, day):
+    """Streak length after activity on ``day``, given the previous state.
+
+    Activity on the same day (or an earlier one, e.g. after a timezone
+    change) leaves the streak as it is.
+    """
+    if last_day is None or current <= 0:
+        return 1
+    if day <= last_day:
+        return current
+    return current + 1 if day - last_day == timedelta(days=1) else 1
+
+
+def live_streak(current, last_day, today):
+    """A stored streak as seen on ``today``: broken once a whole day was missed."""
+    if last_day is None or today - last_day > timedelta(days=1):
+        return 0
+    return current
+
+
+def _to_date(value):
+    return value if isinstance(value, date) or value is None else date.fromisoformat(str(value)[:10])
+
+
+def record_activity(conn, user_id, day, timezone=None):
+    """Update the user's streak for a session completed on ``day``.
+
+    Must run inside the caller's write transaction. Returns the new streak.
+    """
+    row = conn.execute('''
+        SELECT current_streak, longest_streak, last_active_day FROM user_streaks WHERE user_id = ?
+    ''', (user_id,)).fetchone()
+    if row is None:
+        current, longest, last_day = 1, 1, day
+    else:
+        previous_day = _to_date(row['last_active_day'])
+        current = next_streak(row['current_streak'], previous_day, day)
+        longest = max(row['longest_streak'], current)
+        last_day = max(day, previous_day) if previous_day else day
+    conn.execute('''
+        INSERT INTO user_streaks (user_id, current_streak, longest_streak, last_active_day, timezone)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (user_id) DO UPDATE SET
+            current_streak = excluded.current_streak,
+            longest_streak = excluded.longest_streak,
+            last_active_day = excluded.last_active_day,
+            timezone = excluded.timezone
+    ''', (user_id, current, longest, last_day.isoformat(), timezone))
+    return current
+
+
+def read_streak(conn, user_id, now=None):
+    """The user's current streak, as of today in their last-used timezone."""
+    row = conn.execute('''
+        SELECT current_streak, last_active_day, timezone FROM user_streaks WHERE user_id = ?
+    ''', (user_id,)).fetchone()
+    if row is None:
+        return 0
+    return live_streak(row['current_streak'], _to_date(row['last_active_day']), local_day(row['timezone'], now))
+
+
+def rebuild_streaks(conn, user_id=None):
+    """Recompute streaks from the session dates in user_sessions (all users, or one)."""
+    where, params = ('WHERE user_id = ?', (user_id,)) if user_id is not None else ('', ())
+    state = {}
+    rows = conn.execute(f'''
+        SELECT DISTINCT user_id, date(session_date) AS day FROM user_sessions {where} ORDER BY user_id, day
+    ''', params)
+    for row in rows:
+        if row['day'] is None:
+            continue
+        day = date.fromisoformat(row['day'])
+        current, longest, last_day = state.get(row['user_id'], (0, 0, None))
+        current = next_streak(current, last_day, day)
+        state[row['user_id']] = (current, max(longest, current), day)
+
+    # Session history has no timezone; keep the one each user last completed a session in
+    timezones = dict(conn.execute(f'SELECT user_id, timezone FROM user_streaks {where}', params).fetchall())
+    conn.execute(f'DELETE FROM user_streaks {where}', params)
+    conn.executemany('''
+        INSERT INTO user_streaks (user_id, current_streak, longest_streak, last_active_day, timezone)
+        VALUES (?, ?, ?, ?, ?)
+    ''', [(uid, current, longest, day.isoformat(), timezones.get(uid)) for uid, (current, longest, day) in state.items()])
+    return len(state)
@@ -0,0 +1,59 @@
+"""Exercise catalog caching across processes that share one database."""
+
+import os
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+import app as training_app  # noqa: E402
+from catalog import ExerciseCatalog  # noqa: E402
+
+
+class CatalogVersionTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        training_app.DATABASE = os.path.join(self.tmp.name, 'test.db')
+        training_app.init_db()
+        training_app.populate_exercises_db()
+        self.addCleanup(training_app.db_connections.close_all)
+        training_app.exercise_catalog.invalidate()
+        # Stands in for the catalog of a second gunicorn worker
+        self.other = ExerciseCatalog(training_app.load_exercises_from_db, training_app.load_catalog_version)
+        self.size = len(self.other.snapshot().exercises)
+
+    def test_added_exercise_reaches_other_process(self):
+        client = training_app.app.test_client()
+        response = client.post('/api/exercises/add', json={'name': 'New Move', 'category': 'Agility'})
+        self.assertTrue(response.json['success'])
+
+        names = [ex['name'] for ex in self.other.snapshot().exercises]
+        self.assertIn('New Move', names)
+        self.assertEqual(self.other.stats()['reloads'], 1)
+        # The handling process patched its snapshot and does not reload it again
+        training_app.exercise_catalog.snapshot()
+        self.assertEqual(training_app.exercise_catalog.stats()['reloads'], 0)
+
+    def test_sync_by_another_process_is_picked_up(self):
+        rows = training_app.data_registry.get('exercise_rows')
+        changed = rows + [dict(rows[0], name='New Move')]
+        conn = training_app.get_db_connection()
+        training_app.sync_exercises(conn, changed)
+        conn.close()
+
+        self.assertEqual(len(self.other.snapshot().exercises), self.size + 1)
+        # A sync that changes nothing keeps the snapshot
+        conn = training_app.get_db_connection()
+        training_app.sync_exercises(conn, changed)
+        conn.close()
+        snap = self.other.snapshot()
+        self.assertIs(self.other.snapshot(), snap)
+
+
+if __name__ == '__main__':
+    unittest.main()
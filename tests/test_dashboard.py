@@ -0,0 +1,57 @@
+"""Dashboard caching across processes that share one database."""
+
+import os
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+import app as training_app  # noqa: E402
+from dashboard import DashboardCache  # noqa: E402
+
+COMPLETION = {'domainProgress': {'agility': {'exercises': 2, 'minutes': 3}}, 'totalDuration': 3}
+
+
+class DashboardVersionTest(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        training_app.DATABASE = os.path.join(tmp.name, 'test.db')
+        training_app.init_db()
+        self.addCleanup(training_app.db_connections.close_all)
+        self.client = training_app.app.test_client()
+        with self.client.session_transaction() as session:
+            session['user_id'] = 1
+
+    def swap_cache(self, cache):
+        previous = training_app.dashboard_cache
+        training_app.dashboard_cache = cache
+        return previous
+
+    def test_session_saved_by_another_process_is_shown(self):
+        # This process caches the dashboard...
+        other = self.swap_cache(DashboardCache(ttl=30))
+        self.addCleanup(self.swap_cache, other)
+        self.assertEqual(self.client.get('/api/user_progress').json['total_sessions'], 0)
+
+        # ...then another process records a session, invalidating only its own cache
+        mine = self.swap_cache(other)
+        self.client.post('/api/complete_session', json=COMPLETION)
+        self.swap_cache(mine)
+
+        self.assertEqual(self.client.get('/api/user_progress').json['total_sessions'], 2)
+        self.assertEqual(mine.stats()['hits'], 0)
+
+    def test_unchanged_dashboard_is_served_from_cache(self):
+        self.addCleanup(self.swap_cache, self.swap_cache(DashboardCache(ttl=30)))
+        self.client.get('/api/user_progress')
+        self.client.get('/api/user_stats')
+        self.assertEqual(training_app.dashboard_cache.stats()['hits'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
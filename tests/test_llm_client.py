@@ -0,0 +1,134 @@
+"""LLMClient against a local stub of the LM Studio HTTP API."""
+
+import json
+import os
+import sys
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llm_client import CircuitOpenError, LLMClient, LLMClientError  # noqa: E402
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status, body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        self.server.requests.append(('GET', self.path))
+        self._reply(200, {'data': [{'id': 'stub-model'}]})
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.server.requests.append(('POST', self.path))
+        if self.server.fail:
+            self._reply(500, {'error': 'stub failure'})
+            return
+        if not self.server.stream:
+            self._reply(200, {'choices': [{'message': {'content': 'ok'}}]})
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        for i in range(3):
+            self.wfile.write(f'data: {{"n": {i}}}\n\n'.encode('utf-8'))
+            self.wfile.flush()
+        self.wfile.write(b'data: [DONE]\n\n')
+
+
+class LLMClientTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+        self.server.requests = []
+        self.server.fail = False
+        self.server.stream = False
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}/v1'
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def client(self, **kwargs):
+        client = LLMClient(self.url, timeout=2, **kwargs)
+        self.addCleanup(client.reset)
+        return client
+
+    def test_keep_alive_connection_is_reused(self):
+        client = self.client()
+        for _ in range(3):
+            self.assertEqual(client.chat_completion({'messages': []})['choices'][0]['message']['content'], 'ok')
+        self.assertEqual(client.connections_opened, 1)
+
+    def test_loaded_model_is_cached(self):
+        client = self.client(model_ttl=60)
+        self.assertEqual(client.loaded_model(), 'stub-model')
+        self.assertEqual(client.loaded_model(), 'stub-model')
+        self.assertEqual(self.server.requests.count(('GET', '/v1/models')), 1)
+
+    def test_breaker_opens_and_fails_fast(self):
+        client = self.client(failure_threshold=2, reset_timeout=60)
+        self.server.fail = True
+        for _ in range(2):
+            with self.assertRaises(LLMClientError):
+                client.chat_completion({'messages': []})
+        sent = len(self.server.requests)
+        with self.assertRaises(CircuitOpenError):
+            client.chat_completion({'messages': []})
+        self.assertEqual(len(self.server.requests), sent)
+        self.assertEqual(client.stats()['circuit'], 'open')
+
+    def test_half_open_trial_success_closes_breaker(self):
+        client = self.client(failure_threshold=1, reset_timeout=0.05)
+        self.server.fail = True
+        with self.assertRaises(LLMClientError):
+            client.chat_completion({'messages': []})
+        time.sleep(0.1)
+        self.server.fail = False
+        client.chat_completion({'messages': []})
+        self.assertEqual(client.stats()['circuit'], 'closed')
+
+    def test_stream_yields_lines(self):
+        client = self.client()
+        self.server.stream = True
+        lines = [line for line in client.stream_chat_completion({'messages': []}) if line.strip()]
+        self.assertEqual(lines[-1].strip(), b'data: [DONE]')
+        self.assertEqual(len(lines), 4)
+
+    def test_abandoned_half_open_stream_releases_trial(self):
+        client = self.client(failure_threshold=1, reset_timeout=0.05)
+        self.server.fail = True
+        with self.assertRaises(LLMClientError):
+            client.chat_completion({'messages': []})
+        time.sleep(0.1)
+        self.server.fail = False
+        self.server.stream = True
+
+        stream = client.stream_chat_completion({'messages': []})
+        next(stream)
+        # e.g. the SSE client disconnected
+        stream.close()
+
+        self.assertFalse(client.breaker._trial_running)
+        self.server.stream = False
+        client.chat_completion({'messages': []})
+        self.assertEqual(client.stats()['circuit'], 'closed')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+"""Background generation jobs shared between processes through the database."""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db import ConnectionManager  # noqa: E402
+from llm_jobs import CREATE_TABLE, GenerationJobs  # noqa: E402
+
+
+class GenerationJobsTest(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        path = os.path.join(tmp.name, 'jobs.db')
+        with sqlite3.connect(path) as conn:
+            conn.execute(CREATE_TABLE)
+        self.connections = ConnectionManager()
+        self.addCleanup(self.connections.close_all)
+        self.connect = lambda: self.connections.get(path)
+
+    def jobs(self, **kwargs):
+        jobs = GenerationJobs(max_workers=1, connect=self.connect, **kwargs)
+        self.addCleanup(jobs.shutdown)
+        return jobs
+
+    def test_other_process_sees_pending_and_ready_results(self):
+        accepting, polling = self.jobs(), self.jobs()
+        release = threading.Event()
+        future = accepting.submit('w1', lambda: release.wait(5) and {'exercises': [1]})
+        self.assertEqual(polling.status('w1'), ('pending', None))
+        release.set()
+        future.result(5)
+        accepting.shutdown()
+        self.assertEqual(polling.status('w1'), ('ready', {'exercises': [1]}))
+        self.assertEqual(polling.status('missing'), ('unknown', None))
+
+    def test_failed_generation_is_shared(self):
+        accepting, polling = self.jobs(), self.jobs()
+        accepting.submit('w1', lambda: None).result(5)
+        accepting.shutdown()
+        self.assertEqual(polling.status('w1'), ('failed', None))
+
+    def test_submissions_beyond_max_pending_are_rejected(self):
+        jobs = self.jobs(max_pending=1)
+        release = threading.Event()
+        self.addCleanup(release.set)
+        self.assertIsNotNone(jobs.submit('w1', release.wait, 5))
+        self.assertIsNone(jobs.submit('w2', release.wait, 5))
+        self.assertEqual(jobs.status('w2'), ('unknown', None))
+        release.set()
+        jobs.shutdown()
+        self.assertEqual(jobs.stats()['rejected'], 1)
+        self.assertEqual(jobs.stats()['pending'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+"""Schema migrations and the check-query-plans command."""
+
+import os
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+import app as training_app  # noqa: E402
+from migrations import MIGRATIONS, QUERY_PLAN_CHECKS, schema_version  # noqa: E402
+
+
+class QueryPlanCommandTest(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        training_app.DATABASE = os.path.join(tmp.name, 'test.db')
+        self.addCleanup(training_app.db_connections.close_all)
+        self.runner = training_app.app.test_cli_runner()
+
+    def test_hot_queries_use_their_indexes(self):
+        result = self.runner.invoke(args=['check-query-plans'])
+        self.assertEqual(result.exit_code, 0, result.output)
+        for name, index, _, _ in QUERY_PLAN_CHECKS:
+            self.assertIn(f'OK   {name}: ', result.output)
+            self.assertIn(index, result.output)
+        self.assertNotIn('FAIL', result.output)
+
+        conn = training_app.get_db_connection()
+        self.assertEqual(schema_version(conn), MIGRATIONS[-1][0])
+        conn.close()
+
+    def test_missing_index_fails_the_command(self):
+        training_app.init_db()
+        conn = training_app.get_db_connection()
+        conn.execute('DROP INDEX idx_user_sessions_user_date')
+        conn.commit()
+        conn.close()
+
+        result = self.runner.invoke(args=['check-query-plans'])
+        self.assertNotEqual(result.exit_code, 0)
+        self.assertIn('FAIL recent sessions', result.output)
+
+
+if __name__ == '__main__':
+    unittest.main()
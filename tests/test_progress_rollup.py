@@ -0,0 +1,67 @@
+"""The weekly progress rollup, written per session and rebuilt from history."""
+
+import os
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+import app as training_app  # noqa: E402
+from progress_rollup import read_progress, rebuild_rollups  # noqa: E402
+
+
+class RollupRebuildTest(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        training_app.DATABASE = os.path.join(tmp.name, 'test.db')
+        training_app.init_db()
+        self.addCleanup(training_app.db_connections.close_all)
+        self.client = training_app.app.test_client()
+        with self.client.session_transaction() as session:
+            session['user_id'] = 1
+
+    def test_rebuild_matches_recorded_progress(self):
+        # Three exercises were planned but only the strength one was done
+        response = self.client.post('/api/complete_session', json={
+            'exercises': [
+                {'name': 'Squats', 'category': 'Strength & Power', 'duration': 2.0},
+                {'name': 'Sprints', 'category': 'Speed & Mobility', 'duration': 1.0},
+                {'name': 'Puzzle', 'category': 'Cognition', 'duration': 3.0}
+            ],
+            'domainProgress': {
+                'strength_power': {'exercises': 1, 'minutes': 2.0},
+                'speed_mobility': {'exercises': 0, 'minutes': 0},
+                'cognition': {'exercises': 0, 'minutes': 0}
+            },
+            'totalDuration': 2
+        })
+        self.assertEqual(response.status_code, 200)
+
+        conn = training_app.get_db_connection()
+        recorded = read_progress(conn, 1)
+        self.assertEqual(list(recorded[0]), ['strength_power'])
+        self.assertEqual(rebuild_rollups(conn), 1)
+        conn.commit()
+        self.assertEqual(read_progress(conn, 1), recorded)
+        conn.close()
+
+    def test_sessions_without_stored_progress_use_the_exercise_list(self):
+        conn = training_app.get_db_connection()
+        conn.execute('''
+            INSERT INTO user_sessions (user_id, exercises_completed, total_duration, session_type)
+            VALUES (1, '[{"category": "Endurance", "duration": 4}]', 4, 'custom')
+        ''')
+        rebuild_rollups(conn)
+        conn.commit()
+        domains, _ = read_progress(conn, 1)
+        self.assertEqual(domains, {'endurance': {'sessions': 1, 'exercises': 1, 'minutes': 4.0}})
+        conn.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
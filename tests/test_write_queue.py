@@ -0,0 +1,80 @@
+"""WriteBehindQueue batching, per-item failures and retries of locked batches."""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db import ConnectionManager  # noqa: E402
+from write_queue import WriteBehindQueue  # noqa: E402
+
+
+def insert(conn, item):
+    if item < 0:
+        raise ValueError('negative item')
+    conn.execute('INSERT INTO items VALUES (?)', (item,))
+
+
+class WriteBehindQueueTest(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, 'queue.db')
+        with sqlite3.connect(self.path) as conn:
+            conn.execute('PRAGMA journal_mode = WAL')
+            conn.execute('CREATE TABLE items (value INTEGER)')
+        # No busy wait, so a held write lock fails BEGIN IMMEDIATE right away
+        self.connections = ConnectionManager(pragmas=(('busy_timeout', 0),))
+        self.addCleanup(self.connections.close_all)
+        self.committed = []
+        self.queue = WriteBehindQueue(insert, lambda: self.connections.get(self.path),
+                                      on_commit=self.committed.extend, retry_delay=0.05)
+
+    def count(self):
+        with sqlite3.connect(self.path) as conn:
+            return conn.execute('SELECT COUNT(*) FROM items').fetchone()[0]
+
+    def test_bad_item_does_not_lose_the_batch(self):
+        for item in (1, -1, 2):
+            self.queue.submit(item)
+        self.assertTrue(self.queue.flush(5))
+        self.assertEqual(self.count(), 2)
+        self.assertEqual(self.queue.stats()['failed'], 1)
+        self.assertEqual(sorted(self.committed), [1, 2])
+
+    def test_locked_batch_is_retried(self):
+        blocker = sqlite3.connect(self.path, check_same_thread=False)
+        self.addCleanup(blocker.close)
+        blocker.execute('BEGIN IMMEDIATE')
+        release = threading.Timer(0.1, blocker.rollback)
+        release.start()
+        self.addCleanup(release.cancel)
+
+        for item in range(5):
+            self.queue.submit(item)
+        self.assertTrue(self.queue.flush(5))
+        stats = self.queue.stats()
+        self.assertEqual(self.count(), 5)
+        self.assertEqual(stats['failed'], 0)
+        self.assertGreater(stats['retried'], 0)
+
+    def test_items_fail_only_after_retries(self):
+        blocker = sqlite3.connect(self.path)
+        self.addCleanup(blocker.close)
+        blocker.execute('BEGIN IMMEDIATE')
+        self.queue.retries = 1
+        self.queue.submit(1)
+        self.assertTrue(self.queue.flush(5))
+        blocker.rollback()
+        self.assertEqual(self.queue.stats()['failed'], 1)
+        self.assertEqual(self.queue.stats()['retried'], 1)
+        self.assertEqual(self.committed, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
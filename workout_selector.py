@@ -0,0 +1,174 @@
+import bisect
+import os
+import time
+from collections import defaultdict, deque
+
+# Durations are discretized into 0.01 minute units for the knapsack search,
+# which represents every duration in the exercise data exactly
+UNITS_PER_MINUTE = 100
+
+# How far (in minutes) a knapsack selection may overshoot the target duration
+FIT_TOLERANCE = float(os.environ.get('WORKOUT_FIT_TOLERANCE', 0.5))
+
+# Hard per-request time budget for the knapsack search before falling back to greedy
+SELECTION_TIME_BUDGET = float(os.environ.get('WORKOUT_SELECTION_BUDGET_MS', 50)) / 1000
+
+DEFAULT_SELECTION_MODE = os.environ.get('WORKOUT_SELECTION_MODE', 'knapsack')
+
+
+def _duration(exercise):
+    return exercise['duration']
+
+
+def _total(exercises):
+    return sum(ex['duration'] for ex in exercises)
+
+
+def select_greedy(exercises, duration, **options):
+    """Add the shortest exercises first until the target duration is reached."""
+    selected = []
+    total_time = 0
+    for exercise in exercises:
+        if total_time + exercise['duration'] <= duration:
+            selected.append(exercise)
+            total_time += exercise['duration']
+        if total_time >= duration:
+            break
+    return selected
+
+
+def _seed_domains(exercises, duration, categories=None):
+    # Indexes of the shortest exercise of each category, while they fit the
+    # target. Knowing the categories lets the scan stop once all are found.
+    seeds = {}
+    total = 0
+    wanted = len(set(categories)) if categories else None
+    for index, exercise in enumerate(exercises):
+        category = exercise['category']
+        if category not in seeds:
+            fits = total + exercise['duration'] <= duration
+            seeds[category] = index if fits else None
+            if fits:
+                total += exercise['duration']
+            if len(seeds) == wanted:
+                break
+    return [index for index in seeds.values() if index is not None], total
+
+
+def select_knapsack(exercises, duration, tolerance=FIT_TOLERANCE, time_budget=SELECTION_TIME_BUDGET,
+                    categories=None):
+    """Pick exercises whose durations sum as close as possible to the target.
+
+    Every category first gets its shortest exercise, so all requested
+    domains are in the plan. The rest of the time is a bounded subset-sum
+    over groups of equal duration, solved with integer bitsets, so the cost
+    depends on the number of distinct durations rather than the catalog
+    size. Within each group exercises go to whichever category has the
+    least time so far. The greedy fill is returned instead if it fits the
+    target better, or if the search runs past ``time_budget`` seconds.
+    ``categories``, the categories the exercises were looked up for, only
+    saves a full scan of the input.
+    """
+    if duration <= 0 or not exercises:
+        return []
+    deadline = time.perf_counter() + time_budget
+    seeds, seeded = _seed_domains(exercises, duration, categories)
+    target = int(round((duration - seeded) * UNITS_PER_MINUTE))
+    limit = target + int(round(tolerance * UNITS_PER_MINUTE))
+    seeded_at = set(seeds)
+
+    # The input is sorted by duration, so each discretized duration is a
+    # contiguous slice that can be located by bisection
+    groups = {}
+    lo = 0
+    while lo < len(exercises):
+        units = int(round(exercises[lo]['duration'] * UNITS_PER_MINUTE))
+        if units > limit:
+            break
+        hi = bisect.bisect_left(exercises, (units + 0.5) / UNITS_PER_MINUTE, lo, key=_duration)
+        available = hi - lo - sum(1 for index in seeds if lo <= index < hi)
+        if units > 0 and available:
+            groups[units] = (lo, hi, available)
+        lo = hi
+
+    # Bit s of ``reach`` is set when s units are reachable. A group of n equal
+    # exercises is split into items of 1, 2, 4, ... copies, and ``history``
+    # keeps the bitset from before each item for the walk back.
+    mask = (1 << (limit + 1)) - 1
+    reach = 1
+    items, history = [], []
+    for units, (_, _, available) in groups.items():
+        if time.perf_counter() > deadline:
+            print(f"Knapsack selection exceeded {time_budget * 1000:.0f}ms budget, using greedy fill")
+            return select_greedy(exercises, duration)
+        copies = 1
+        while available:
+            take = min(copies, available)
+            history.append(reach)
+            items.append((units, take))
+            reach |= (reach << (units * take)) & mask
+            available -= take
+            copies *= 2
+
+    # Closest reachable sum to the target, preferring to stay under it on ties
+    best = 0
+    for delta in range(limit + 1):
+        if 0 <= target - delta and reach >> (target - delta) & 1:
+            best = target - delta
+            break
+        if target + delta <= limit and reach >> (target + delta) & 1:
+            best = target + delta
+            break
+
+    counts = defaultdict(int)
+    s = best
+    for i in range(len(items) - 1, -1, -1):
+        if s == 0:
+            break
+        if not history[i] >> s & 1:
+            units, take = items[i]
+            counts[units] += take
+            s -= units * take
+
+    # Longest exercises are placed first so the short ones can even out the domains
+    selected = [exercises[index] for index in seeds]
+    allocated = defaultdict(float)
+    for exercise in selected:
+        allocated[exercise['category']] += exercise['duration']
+    for units in sorted(counts, reverse=True):
+        by_category = defaultdict(deque)
+        lo, hi, _ = groups[units]
+        for index in range(lo, hi):
+            if index not in seeded_at:
+                by_category[exercises[index]['category']].append(exercises[index])
+        for _ in range(counts[units]):
+            category = min((c for c in by_category if by_category[c]), key=lambda c: allocated[c])
+            exercise = by_category[category].popleft()
+            allocated[category] += exercise['duration']
+            selected.append(exercise)
+
+    # Judge both by their real durations, not the discretized ones
+    error = abs(_total(selected) - duration)
+    if error > 1e-9:
+        greedy = select_greedy(exercises, duration)
+        if abs(_total(greedy) - duration) < error - 1e-9:
+            return greedy
+    selected.sort(key=_duration)
+    return selected
+
+
+SELECTION_MODES = {
+    'greedy': select_greedy,
+    'knapsack': select_knapsack
+}
+
+
+def select_exercises(exercises, duration, mode=None, **options):
+    """Select exercises to fill ``duration`` minutes using the given selection mode.
+
+    ``exercises`` must be sorted by duration, as returned by lookup_exercises.
+    Returns the selected exercises and their total duration.
+    """
+    selector = SELECTION_MODES.get(mode or DEFAULT_SELECTION_MODE, select_knapsack)
+    selected = selector(exercises, duration, **options)
+    return selected, _total(selected)
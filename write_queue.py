@@ -0,0 +1,167 @@
+import os
+import queue
+import threading
+import time
+import traceback
+
+
+class WriteBehindQueue:
+    """Applies queued writes from a single thread, committing them in batches.
+
+    ``submit`` only appends to a bounded in-memory queue and returns False when
+    it is full, so callers can fall back to writing synchronously. The writer
+    thread drains up to ``batch_size`` items (waiting at most ``max_delay``
+    seconds for more to arrive) and applies them with ``handler(conn, item)``
+    in one transaction. Each item runs in its own savepoint, so a bad item is
+    rolled back and logged without losing the rest of the batch.
+    ``on_commit(items)``, if given, is called with the items of each batch
+    once they are committed.
+
+    Items were already acknowledged to clients, so a batch that cannot be
+    committed (e.g. "database is locked") is retried ``retries`` times with
+    exponential backoff from ``retry_delay`` seconds, then written item by
+    item. Only items that still fail then are counted as failed.
+    """
+
+    def __init__(self, handler, connect, max_size=1000, batch_size=100, max_delay=0.05, on_commit=None,
+                 retries=3, retry_delay=0.1):
+        self.handler = handler
+        self.connect = connect
+        self.on_commit = on_commit
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self._queue = queue.Queue(maxsize=max_size)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self.submitted = 0
+        self.rejected = 0
+        self.written = 0
+        self.failed = 0
+        self.batches = 0
+        self.retried = 0
+
+    def submit(self, item):
+        """Queue ``item`` for writing; returns False if the queue is full."""
+        self._ensure_writer()
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            with self._lock:
+                self.rejected += 1
+            return False
+        with self._lock:
+            self.submitted += 1
+        return True
+
+    def flush(self, timeout=None):
+        """Block until every queued item has been committed (or timeout seconds pass)."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        return True
+
+    def stats(self):
+        """Queue counters for the debug endpoint."""
+        return {
+            'queued': self._queue.qsize(),
+            'submitted': self.submitted,
+            'rejected': self.rejected,
+            'written': self.written,
+            'failed': self.failed,
+            'batches': self.batches,
+            'retried': self.retried
+        }
+
+    def _ensure_writer(self):
+        # Start lazily, and again in a forked worker: threads don't survive fork
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._write(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _write(self, batch):
+        for attempt in range(self.retries + 1):
+            try:
+                written = self._commit(batch)
+                break
+            except Exception as e:
+                if attempt == self.retries:
+                    print(f"[ERROR] Write-behind batch failed {attempt + 1} times, writing items one by one:")
+                    traceback.print_exc()
+                    written = self._write_each(batch)
+                    break
+                delay = self.retry_delay * 2 ** attempt
+                self.retried += 1
+                print(f"[WARN] Write-behind batch failed ({e}), retrying in {delay:.2f}s")
+                time.sleep(delay)
+        if self.on_commit and written:
+            self.on_commit(written)
+
+    def _write_each(self, batch):
+        written = []
+        for item in batch:
+            try:
+                written.extend(self._commit([item]))
+            except Exception as e:
+                self.failed += 1
+                print(f"[ERROR] Write-behind item lost: {e}")
+        return written
+
+    def _commit(self, batch):
+        """Apply ``batch`` in one transaction and return the items written.
+
+        Raises if the transaction itself fails; nothing is counted then.
+        """
+        conn = self.connect()
+        written = []
+        failed = 0
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            for item in batch:
+                conn.execute('SAVEPOINT write_item')
+                try:
+                    self.handler(conn, item)
+                    conn.execute('RELEASE write_item')
+                    written.append(item)
+                except Exception as e:
+                    conn.execute('ROLLBACK TO write_item')
+                    conn.execute('RELEASE write_item')
+                    failed += 1
+                    print(f"[ERROR] Write-behind item failed: {e}")
+            conn.commit()
+        except Exception:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        finally:
+            conn.close()
+        self.written += len(written)
+        self.failed += failed
+        self.batches += 1
+        return written